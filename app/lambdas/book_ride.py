@@ -1,14 +1,51 @@
 from decimal import Decimal
 import json
+import time
 import traceback
 import uuid
 import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
 from datetime import datetime
 
+import booking_state
+import event_publisher
+import pagination
+
 dynamodb = boto3.resource('dynamodb')
 book_ride_table = dynamodb.Table('RUBookRide')
 rides_table = dynamodb.Table('RUCarRides')  # Existing rides table
-event_bridge = boto3.client("events", region_name="us-east-1")
+RIDE_REQUESTS_INDEX = "ride_id-created_at-index"  # GSI: ride_id (HASH), created_at (RANGE)
+DRIVER_REQUESTS_INDEX = "driver_id-status_created-index"  # GSI: driver_id (HASH), status_created (RANGE)
+RIDER_REQUESTS_INDEX = "rider_id-created_at-index"  # GSI: rider_id (HASH), created_at (RANGE)
+# Batch decisions: one seat update and seat event per transaction, plus a status change, waitlist item and outbox event per request
+BATCH_CHUNK_SIZE = (booking_state.TRANSACTION_LIMIT - 2) // 3
+MAX_BATCH_ACTIONS = 10 * BATCH_CHUNK_SIZE  # At most 10 transactions per call
+RIDE_SUMMARY_FIELDS = ["ride_id", "user_id", "from_location", "to_location", "departure_time",
+                       "ride_status", "available_seats", "total_seats", "ride_price"]
+
+
+def ride_request_id(ride_id, rider_id):
+    """One request per (ride, rider): the id is derived from both, so duplicates collide on the key."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"rucarpool:ride-request:{ride_id}:{rider_id}"))
+
+
+def fit_to_seats(transitions, available_seats, user_id):
+    """Accepts beyond the ride's free seats become waitlist transitions, in batch order, like a single accept on a full ride."""
+    fitted = []
+    for t in transitions:
+        if t.action == 'accept' and -t.seat_delta > available_seats:
+            t = booking_state.plan(t.request, 'waitlist', user_id)
+        available_seats += t.seat_delta
+        fitted.append(t)
+    return fitted
+
+
+def get_available_seats(ride_id):
+    ride = rides_table.get_item(Key={'ride_id': ride_id}, ConsistentRead=True, ProjectionExpression='available_seats').get('Item')
+    if not ride:
+        raise booking_state.BookingError(404, 'Ride not found')
+    return int(ride.get('available_seats') or 0)
 
 
 def to_serializable(value):
@@ -29,6 +66,7 @@ def lambda_handler(event, context):
 
         method = event.get('httpMethod') or event.get('requestContext', {}).get('http', {}).get('method')
         path_params = event.get('pathParameters', {}) or event.get('requestContext', {}).get('pathParameters', {})
+        query_params = event.get('queryStringParameters') or {}
 
         print("Extracted Path Parameters:", path_params)
 
@@ -38,11 +76,17 @@ def lambda_handler(event, context):
         elif method == 'PUT' and 'ride_id' in path_params and 'request_id' in path_params:
             return update_ride_request(event, path_params['ride_id'], path_params['request_id'])
         
+        elif method == 'PUT' and 'ride_id' in path_params:
+            return batch_update_ride_requests(event, path_params['ride_id'])
+        
         elif method == 'GET' and 'ride_id' in path_params:
-            return get_ride_requests(path_params['ride_id'])
+            return get_ride_requests(path_params['ride_id'], query_params)
+        
+        elif method == 'GET' and 'user_id' in path_params:
+            return get_rider_requests(path_params['user_id'], query_params)
         
         elif method == 'GET' and 'driver_id' in path_params:
-            return get_driver_requests(path_params['driver_id'])
+            return get_driver_requests(path_params['driver_id'], query_params)
         
         elif method == 'DELETE' and 'request_id' in path_params:
             return delete_ride_request(path_params['request_id'])
@@ -108,7 +152,8 @@ def create_ride_request(event, ride_id):
             }
 
         # 🆕 Create ride request
-        request_id = str(uuid.uuid4())
+        request_id = ride_request_id(ride_id, rider_id)
+        created_at = datetime.utcnow().isoformat()
         request = {
             'request_id': request_id,
             'ride_id': ride_id,
@@ -117,31 +162,54 @@ def create_ride_request(event, ride_id):
             'seats_requested': body.get('seats_requested'),
             'notes': body.get('notes'),
             'ride_status': 'pending',
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat()
+            'status_created': booking_state.status_sort_key('pending', created_at),
+            'created_at': created_at,
+            'updated_at': created_at,
+            'version': 1
         }
 
         print(f"Saving request: {json.dumps(to_serializable(request), indent=2)}")  # Convert request before saving
-        book_ride_table.put_item(Item=request)
-        
-        # 🚀 Step 1: Publish to EventBridge
-        event_bridge.put_events(
-            Entries=[
+        # 🚀 Step 1: Save the request and its RideRequested event together (published from the outbox)
+        # A rider who already has a live request for this ride gets it back and nothing fans out again;
+        # only a canceled request may be replaced by a new one.
+        try:
+            booking_state.dynamodb_client.transact_write_items(TransactItems=[
                 {
-                    "Source": "ru.carpooling",
-                    "DetailType": "RideRequested",
-                    "Detail": json.dumps({
-                        "RideID": ride_id,
-                        "RequestID": request_id,
-                        "RiderID": rider_id,
-                        "DriverID": ride.get('user_id'),
-                        "SeatsRequested": body.get('seats_requested'),
-                        "Timestamp": datetime.utcnow().isoformat()
-                    }),
-                    "EventBusName": "RUCarpoolingEventBus"
-                }
-            ]
-        )
+                    'Put': {
+                        'TableName': book_ride_table.name,
+                        'Item': pagination.to_attribute_values(request),
+                        'ConditionExpression': 'attribute_not_exists(request_id) OR ride_status = :canceled',
+                        'ExpressionAttributeValues': pagination.to_attribute_values({':canceled': 'canceled'}),
+                        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+                    }
+                },
+                event_publisher.outbox_put(event_publisher.event_entry("RideRequested", {
+                    "RideID": ride_id,
+                    "RequestID": request_id,
+                    "RiderID": rider_id,
+                    "DriverID": ride.get('user_id'),
+                    "SeatsRequested": body.get('seats_requested'),
+                    "Timestamp": datetime.utcnow().isoformat()
+                }))
+            ])
+        except ClientError as e:
+            reasons = e.response.get('CancellationReasons', [])
+            if not (reasons and reasons[0].get('Code') == 'ConditionalCheckFailed'):
+                raise
+            existing_status = reasons[0].get('Item', {}).get('ride_status', {}).get('S')
+            print(f"Duplicate request from {rider_id} for ride {ride_id}, returning {request_id}")
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'message': 'Ride request already exists',
+                    'request_id': request_id,
+                    'ride_status': existing_status
+                })
+            }
 
         return {
             'statusCode': 201,
@@ -175,109 +243,33 @@ def update_ride_request(event, ride_id, request_id):
         
         # Get request details
         request = book_ride_table.get_item(Key={'request_id': request_id}).get('Item')
-        if not request:
+        if not request or request.get('ride_id') != ride_id:
             return {'statusCode': 404, 'body': json.dumps({'error': 'Request not found'})}
-        
-        # Get ride details
-        ride = rides_table.get_item(Key={'ride_id': ride_id}).get('Item')
-        if not ride:
-            return {'statusCode': 404, 'body': json.dumps({'error': 'Ride not found'})}
 
         # Convert Decimal values for safe JSON serialization
         request = to_serializable(request)
-        ride = to_serializable(ride)
-
-        # Retrieve the number of seats requested from the request item
-        # Default to 1 if it's missing, but you can enforce that it must exist
-        seats_requested = int(request.get('seats_requested', 1))
 
-        # Handling Driver Permissions for Accept/Reject
-        if action in ['accept', 'reject']:
-            if user_id != request['driver_id']:
-                return {
-                    'statusCode': 403,
-                    'body': json.dumps({'error': 'Only the driver can accept or reject requests'})
-                }
-            
-            updated_status = 'accepted' if action == 'accept' else 'rejected'
-
-            # If accepted, decrease available seats by the number requested
-            if updated_status == 'accepted':
-                available_seats = ride['available_seats']
-                
-                # Check if enough seats are available
-                if available_seats >= seats_requested:
-                    new_seats = available_seats - seats_requested
-                    rides_table.update_item(
-                        Key={'ride_id': ride_id},
-                        UpdateExpression='SET available_seats = :new_seats',
-                        ExpressionAttributeValues={':new_seats': new_seats}
-                    )
-                else:
-                    return {
-                        'statusCode': 400,
-                        'body': json.dumps({'error': 'Not enough available seats'})
-                    }
-        
-        # Handling Cancellation (Both Rider & Driver)
-        elif action == 'cancel':
-            if user_id not in [request['rider_id'], request['driver_id']]:
-                return {
-                    'statusCode': 403,
-                    'body': json.dumps({'error': 'Only the rider or driver can cancel the request'})
-                }
-
-            updated_status = 'canceled'
-
-            # If canceling an already accepted ride, restore the seats
-            if request['ride_status'] == 'accepted':
-                available_seats = ride['available_seats']
-                new_seats = available_seats + seats_requested
-                rides_table.update_item(
-                    Key={'ride_id': ride_id},
-                    UpdateExpression='SET available_seats = :new_seats',
-                    ExpressionAttributeValues={':new_seats': new_seats}
-                )
-       
-        if action in ['accept', 'reject', 'cancel']:
-            # 🚀 Step 1: Publish to EventBridge
-            event_bridge.put_events(
-                Entries=[
-                    {
-                        "Source": "ru.carpooling",
-                        "DetailType": "RideDetailsUpdated",
-                        "Detail": json.dumps({
-                            "RideID": ride_id,
-                            "RequestID": request_id,
-                            "RiderID": request['rider_id'],
-                            "DriverID": request['driver_id'],
-                            "SeatsRequested": body.get('seats_requested'),
-                            "Timestamp": datetime.utcnow().isoformat(),
-                            "notification_type": "Ride " + action,
-                        }),
-                        "EventBusName": "RUCarpoolingEventBus"
-                    }
-                ]
-            )
-            print("Putting in the bus")
-        
-        # Update request status in DynamoDB
-        book_ride_table.update_item(
-            Key={'request_id': request_id},
-            UpdateExpression='SET ride_status = :ride_status, updated_at = :updated_at',
-            ExpressionAttributeValues={
-                ':ride_status': updated_status,
-                ':updated_at': datetime.utcnow().isoformat()
-            }
-        ) 
-        
-        # (Optional) Send notification to the relevant party here...
+        # Permissions, legal transition and seat effect come from the state machine;
+        # the write is pinned to the status and version just read
+        try:
+            transition = booking_state.plan(request, action, user_id)
+            try:
+                promotions = booking_state.commit(transition, [event_publisher.outbox_put(booking_state.ride_updated_entry(request, action))])
+            except booking_state.BookingError as e:
+                if action != 'accept' or e.status_code != 400:
+                    raise
+                # 🕒 Ride is full: queue the request instead, to be promoted when seats free up
+                transition = booking_state.plan(request, 'waitlist', user_id)
+                promotions = booking_state.commit(transition, [event_publisher.outbox_put(booking_state.ride_updated_entry(request, 'waitlisted'))])
+        except booking_state.BookingError as e:
+            return {'statusCode': e.status_code, 'body': json.dumps({'error': e.message})}
 
         return {
-            'statusCode': 200,
+            'statusCode': 202 if transition.to_status == 'waitlisted' else 200,
             'body': json.dumps({
-                'message': f'Ride request {updated_status}',
-                'request_id': request_id
+                'message': f'Ride request {transition.to_status}',
+                'request_id': request_id,
+                'promoted_request_ids': [p.request['request_id'] for p in promotions]
             })
         }
     
@@ -288,6 +280,105 @@ def update_ride_request(event, ride_id, request_id):
             'body': json.dumps({'error': f'Internal server error: {str(e)}'})
         }
         
+# 🟠 PUT - Accept/Reject Many Requests for One Ride
+# @app.put("/rides/{ride_id}/requests")
+def batch_update_ride_requests(event, ride_id):
+    """
+    Apply a driver's accept/reject decisions for several requests of one ride.
+    Body: {"user_id": ..., "actions": [{"request_id": ..., "action": "accept" | "reject"}, ...]}
+    All decisions are validated together; seat and status changes and their outbox
+    events are written in transactions of up to 100 items, one seat
+    update per transaction. Accepts that don't fit the free seats are waitlisted.
+    """
+    try:
+        body = json.loads(event.get("body") or "{}")
+        user_id = body.get('user_id')
+        actions = body.get('actions') or []
+
+        if not actions:
+            return {'statusCode': 400, 'body': json.dumps({'error': 'actions is required'})}
+        if not isinstance(actions, list):
+            return {'statusCode': 400, 'body': json.dumps({'error': 'actions must be a list'})}
+        if len(actions) > MAX_BATCH_ACTIONS:
+            return {'statusCode': 400, 'body': json.dumps({'error': 'Too many actions in one batch'})}
+
+        # 1️⃣ Every entry needs a request_id; malformed entries are reported with the rest of the batch
+        errors = []
+        for index, a in enumerate(actions):
+            if not isinstance(a, dict):
+                errors.append({'index': index, 'error': 'Each action must be an object'})
+            elif not a.get('request_id') or not isinstance(a['request_id'], str):
+                errors.append({'index': index, 'error': 'request_id is required'})
+        if errors:
+            return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid batch', 'details': errors})}
+        request_ids = [a['request_id'] for a in actions]
+        if len(set(request_ids)) != len(request_ids):
+            return {'statusCode': 400, 'body': json.dumps({'error': 'Each request_id may appear only once'})}
+
+        requests = {r['request_id']: to_serializable(r) for r in batch_get_items(book_ride_table, 'request_id', request_ids)}
+
+        # 2️⃣ Validate every decision against the state machine before writing anything
+        transitions = []
+        for a in actions:
+            request = requests.get(a['request_id'])
+            if a.get('action') not in ['accept', 'reject']:
+                errors.append({'request_id': a['request_id'], 'error': 'Invalid action'})
+                continue
+            if not request or request['ride_id'] != ride_id:
+                errors.append({'request_id': a['request_id'], 'error': 'Request not found'})
+                continue
+            try:
+                transitions.append(booking_state.plan(request, a['action'], user_id))
+            except booking_state.BookingError as e:
+                errors.append({'request_id': a['request_id'], 'error': e.message})
+        if errors:
+            return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid batch', 'details': errors})}
+
+        # 3️⃣ Write in chunks of BATCH_CHUNK_SIZE decisions
+        results = []
+        try:
+            available_seats = get_available_seats(ride_id)
+        except booking_state.BookingError as e:
+            return {'statusCode': e.status_code, 'body': json.dumps({'error': e.message})}
+        for start in range(0, len(transitions), BATCH_CHUNK_SIZE):
+            chunk = fit_to_seats(transitions[start:start + BATCH_CHUNK_SIZE], available_seats, user_id)
+            try:
+                for attempt in range(2):
+                    transact_items = booking_state.transition_items(*chunk)
+                    transact_items += [event_publisher.outbox_put(booking_state.ride_updated_entry(
+                        t.request, 'waitlisted' if t.action == 'waitlist' else t.action)) for t in chunk]
+                    transact_items += booking_state.seats_changed_items(chunk)
+                    try:
+                        booking_state.execute(transact_items)
+                        break
+                    except booking_state.BookingError as e:
+                        if e.status_code != 400 or attempt:
+                            raise
+                        # Seats were taken since they were read: fit the chunk to the current count once more
+                        available_seats = get_available_seats(ride_id)
+                        chunk = fit_to_seats(transitions[start:start + BATCH_CHUNK_SIZE], available_seats, user_id)
+            except booking_state.BookingError as e:
+                results.extend({'request_id': t.request['request_id'], 'status': 'failed', 'error': e.message} for t in chunk)
+                continue
+            available_seats += sum(t.seat_delta for t in chunk)
+
+            results.extend({'request_id': t.request['request_id'], 'status': t.to_status} for t in chunk)
+
+        failed = sum(1 for r in results if r['status'] == 'failed')
+        return {
+            'statusCode': 200 if not failed else (207 if failed < len(results) else 409),
+            'body': json.dumps({'results': results})
+        }
+
+    except json.JSONDecodeError:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid JSON format'})}
+    except Exception as e:
+        print(f"Error in batch_update_ride_requests: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': f'Internal server error: {str(e)}'})
+        }
+
 def convert_decimal(obj):
     """Recursively converts Decimal objects to int or float"""
     if isinstance(obj, list):
@@ -301,46 +392,118 @@ def convert_decimal(obj):
     
 
 # 🔵 3️⃣ GET - Fetch Ride Requests (For a Specific Ride)
-def get_ride_requests(ride_id):
+def get_ride_requests(ride_id, query_params=None):
+    """Page through one ride's requests, oldest first. Optional ?status=, ?limit=, ?cursor=."""
     if not ride_id:
         return {'statusCode': 400, 'body': json.dumps({'error': 'Missing ride_id'})}
-    
-    response = book_ride_table.scan(
-        FilterExpression='ride_id = :ride_id',
-        ExpressionAttributeValues={':ride_id': ride_id}
-    )
+
+    query_params = query_params or {}
+    query_kwargs = {
+        'IndexName': RIDE_REQUESTS_INDEX,
+        'KeyConditionExpression': Key('ride_id').eq(ride_id)
+    }
+    if query_params.get('status'):
+        query_kwargs['FilterExpression'] = Attr('ride_status').eq(query_params['status'])
+
+    try:
+        limit = pagination.parse_limit(query_params.get('limit'))
+        items, next_cursor = pagination.query_page(book_ride_table, limit, query_params.get('cursor'), **query_kwargs)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
     
     # Convert Decimal values before returning
-    items = convert_decimal(response.get('Items', []))
+    items = convert_decimal(items)
     
     return {
         'statusCode': 200,
-        'body': json.dumps({'requests': items})
+        'body': json.dumps({'requests': items, 'next_cursor': next_cursor})
     }
     
 # 🔵 3️⃣ GET - Fetch Rides (For a Specific Driver)
 # @app.get("/rides/{driver_id}")
-def get_driver_requests(driver_id):
+def get_driver_requests(driver_id, query_params=None):
+    """Driver inbox: requests across all of the driver's rides. ?status=pending narrows it with begins_with."""
     try:
         if not driver_id:
             return {'statusCode': 400, 'body': json.dumps({'error': 'Missing driver_id'})}
+
+        query_params = query_params or {}
+        key_condition = Key('driver_id').eq(driver_id)
+        if query_params.get('status'):
+            key_condition &= Key('status_created').begins_with(f"{query_params['status']}#")
         
-        response = book_ride_table.scan(
-            FilterExpression='driver_id = :driver_id',
-            ExpressionAttributeValues={':driver_id': driver_id}
+        limit = pagination.parse_limit(query_params.get('limit'))
+        items, next_cursor = pagination.query_page(
+            book_ride_table, limit, query_params.get('cursor'),
+            IndexName=DRIVER_REQUESTS_INDEX,
+            KeyConditionExpression=key_condition
         )
         
-        print("response for the driver ", response)
-        
         # Convert Decimal values before returning
-        items = convert_decimal(response.get('Items', []))
-        
-        print("response1 for the driver ", response)
+        items = convert_decimal(items)
         
         return {
             'statusCode': 200,
-            'body': json.dumps({'requests': items})
+            'body': json.dumps({'requests': items, 'next_cursor': next_cursor})
         }
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
+    except Exception as e:
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+def batch_get_items(table, key_name, key_values, fields=None):
+    """Fetch many items by key with batch_get_item (100 keys per call), retrying unprocessed keys with backoff."""
+    keys = [{key_name: value} for value in dict.fromkeys(key_values)]
+    items = []
+    for start in range(0, len(keys), 100):
+        request = {'Keys': keys[start:start + 100]}
+        if fields:
+            request['ProjectionExpression'] = ', '.join(f'#{f}' for f in fields)
+            request['ExpressionAttributeNames'] = {f'#{f}': f for f in fields}
+        request_items = {table.name: request}
+        attempt = 0
+        while request_items:
+            if attempt:
+                time.sleep(0.1 * 2 ** min(attempt, 5))
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            items.extend(response['Responses'].get(table.name, []))
+            request_items = response.get('UnprocessedKeys') or {}
+            attempt += 1
+    return items
+
+
+def get_ride_summaries(ride_ids):
+    """Fetch summary fields for many rides in one batch read, keyed by ride_id."""
+    return {ride['ride_id']: ride for ride in batch_get_items(rides_table, 'ride_id', ride_ids, RIDE_SUMMARY_FIELDS)}
+
+
+# 🔵 GET - Fetch a Rider's Own Requests (with ride summaries)
+# @app.get("/users/{user_id}/requests")
+def get_rider_requests(rider_id, query_params=None):
+    """A rider's requests across all rides, newest first, each joined with its ride summary."""
+    try:
+        query_params = query_params or {}
+        query_kwargs = {
+            'IndexName': RIDER_REQUESTS_INDEX,
+            'KeyConditionExpression': Key('rider_id').eq(rider_id),
+            'ScanIndexForward': False
+        }
+        if query_params.get('status'):
+            query_kwargs['FilterExpression'] = Attr('ride_status').eq(query_params['status'])
+
+        limit = pagination.parse_limit(query_params.get('limit'))
+        items, next_cursor = pagination.query_page(book_ride_table, limit, query_params.get('cursor'), **query_kwargs)
+
+        rides = get_ride_summaries({item['ride_id'] for item in items})
+        for item in items:
+            item['ride'] = rides.get(item['ride_id'])  # None if the ride has since been deleted
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'requests': convert_decimal(items), 'next_cursor': next_cursor})
+        }
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
 
@@ -351,15 +514,25 @@ def delete_ride_request(request_id):
     if not request:
         return {'statusCode': 404, 'body': json.dumps({'error': 'Request not found'})}
 
-    # Delete request
-    book_ride_table.delete_item(Key={'request_id': request_id})
+    # Delete request, giving back its seats if it was accepted
+    request = to_serializable(request)
+    try:
+        try:
+            booking_state.commit(booking_state.plan(request, 'delete'))
+        except booking_state.BookingError as e:
+            if e.status_code != 404:
+                raise
+            # The ride is already gone, so there are no seats to give back
+            booking_state.execute(booking_state.transition_items(booking_state.plan(request, 'delete', release_seats=False)))
+    except booking_state.BookingError as e:
+        return {'statusCode': e.status_code, 'body': json.dumps({'error': e.message})}
     
     return {
         'statusCode': 200,
         'body': json.dumps({'message': 'Ride request cancelled'})
     }
     
-# zip function.zip book_ride.py
+# zip function.zip book_ride.py booking_state.py event_publisher.py pagination.py
 # aws lambda update-function-code \
 #     --function-name RUBookRideLambda \
 #     --zip-file fileb://function.zip \
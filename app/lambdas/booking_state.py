@@ -0,0 +1,315 @@
+"""
+Ride request state machine shared by every booking path. Transitions are written
+as conditional TransactWriteItems pinned to the status and version that were read,
+so checks need no extra reads and a retried or racing write fails instead of applying twice.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+import event_publisher
+import pagination
+
+dynamodb = boto3.resource('dynamodb')
+# Transaction items are already in DynamoDB JSON (pagination.to_attribute_values); the resource's
+# client would serialize them a second time, so transactions go through a plain client
+dynamodb_client = boto3.client('dynamodb')
+BOOK_RIDE_TABLE_NAME = 'RUBookRide'
+RIDES_TABLE_NAME = 'RUCarRides'
+WAITLIST_TABLE_NAME = 'RURideWaitlist'  # PK ride_id, SK position "<queued_at>#<request_id>" (FIFO order)
+TRANSACTION_LIMIT = 100  # Max items per TransactWriteItems call
+MAX_PROMOTIONS = 10  # Waitlist entries considered per release of seats (each adds 3 transaction items)
+MAX_COMMIT_ATTEMPTS = 3  # Promotions race other releases and seat changes; the waitlist is read again on each attempt
+
+# (current status, action) -> (new status, seat effect); the seat effect is multiplied by seats_requested
+TRANSITIONS = {
+    ('pending', 'accept'): ('accepted', -1),  # Takes the seats
+    ('pending', 'reject'): ('rejected', 0),
+    ('pending', 'cancel'): ('canceled', 0),
+    ('accepted', 'cancel'): ('canceled', 1),  # Gives the seats back
+    ('pending', 'waitlist'): ('waitlisted', 0),  # Accepted while the ride was full
+    ('waitlisted', 'promote'): ('accepted', -1),  # Seats freed up, in FIFO order
+    ('waitlisted', 'reject'): ('rejected', 0),
+    ('waitlisted', 'cancel'): ('canceled', 0),
+}
+
+# Deleting a request gives back any seats it still holds
+DELETE_SEAT_EFFECT = {'pending': 0, 'accepted': 1, 'waitlisted': 0, 'rejected': 0, 'canceled': 0}
+
+# Request fields naming the users allowed to perform each action
+ACTORS = {
+    'accept': (['driver_id'], 'Only the driver can accept or reject requests'),
+    'reject': (['driver_id'], 'Only the driver can accept or reject requests'),
+    'cancel': (['rider_id', 'driver_id'], 'Only the rider or driver can cancel the request'),
+    'delete': (['rider_id', 'driver_id'], 'Only the rider or driver can delete the request'),
+    'waitlist': (['driver_id'], 'Only the driver can accept or reject requests'),
+    'promote': ([], 'Requests are only promoted from the waitlist'),  # System only, never with a user_id
+}
+
+Transition = namedtuple('Transition', ['request', 'action', 'from_status', 'to_status', 'seat_delta'])
+
+class BookingError(Exception):
+    """A booking change that cannot be applied, with the HTTP status to answer with."""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def status_sort_key(ride_status, created_at):
+    """Sort key for the driver inbox index: "<ride_status>#<created_at>", so one status is a begins_with query."""
+    return f"{ride_status}#{created_at}"
+
+
+def plan(request, action, user_id=None, release_seats=True):
+    """
+    Check an action against the state machine and return its Transition.
+    Pass user_id to enforce who may act; release_seats=False skips seat side
+    effects (the ride itself is going away). Raises BookingError.
+    """
+    if action not in ACTORS:
+        raise BookingError(400, 'Invalid action')
+
+    allowed_fields, forbidden_message = ACTORS[action]
+    if user_id is not None and user_id not in [request.get(field) for field in allowed_fields]:
+        raise BookingError(403, forbidden_message)
+
+    from_status = request['ride_status']
+    if action == 'delete':
+        to_status, seat_effect = None, DELETE_SEAT_EFFECT.get(from_status, 0)
+    elif (from_status, action) in TRANSITIONS:
+        to_status, seat_effect = TRANSITIONS[(from_status, action)]
+    else:
+        raise BookingError(409, f'Request is already {from_status}')
+
+    seat_delta = seat_effect * int(request.get('seats_requested') or 1) if release_seats or seat_effect < 0 else 0
+    if to_status == 'waitlisted':
+        request = {**request, 'waitlist_position': f"{datetime.utcnow().isoformat()}#{request['request_id']}"}
+    return Transition(request, action, from_status, to_status, seat_delta)
+
+
+def _version_condition(request):
+    """Condition pinning the request to the version that was read (requests from before versioning have none)."""
+    if request.get('version') is None:
+        return 'attribute_not_exists(version)', {}
+    return 'version = :version', {':version': int(request['version'])}
+
+
+def request_item(transition):
+    """Transaction item writing the request side of a transition (an Update, or a Delete for 'delete')."""
+    request = transition.request
+    version_condition, values = _version_condition(request)
+    values[':from_status'] = transition.from_status
+    key = pagination.to_attribute_values({'request_id': request['request_id']})
+    condition = f'ride_status = :from_status AND {version_condition}'
+
+    if transition.to_status is None:
+        return {'Delete': {
+            'TableName': BOOK_RIDE_TABLE_NAME,
+            'Key': key,
+            'ConditionExpression': condition,
+            'ExpressionAttributeValues': pagination.to_attribute_values(values)
+        }}
+
+    update_expression = ('SET ride_status = :to_status, status_created = :status_created, '
+                         'updated_at = :updated_at, version = if_not_exists(version, :zero) + :one')
+    if transition.to_status == 'waitlisted':
+        update_expression += ', waitlist_position = :waitlist_position'
+        values[':waitlist_position'] = request['waitlist_position']
+
+    values.update({
+        ':to_status': transition.to_status,
+        ':status_created': status_sort_key(transition.to_status, request['created_at']),
+        ':updated_at': datetime.utcnow().isoformat(),
+        ':zero': 0,
+        ':one': 1
+    })
+    return {'Update': {
+        'TableName': BOOK_RIDE_TABLE_NAME,
+        'Key': key,
+        'UpdateExpression': update_expression,
+        'ConditionExpression': condition,
+        'ExpressionAttributeValues': pagination.to_attribute_values(values)
+    }}
+
+
+def seat_item(ride_id, seat_delta):
+    """Transaction item that moves a ride's available_seats by seat_delta without overbooking."""
+    return {'Update': {
+        'TableName': RIDES_TABLE_NAME,
+        'Key': pagination.to_attribute_values({'ride_id': ride_id}),
+        'UpdateExpression': 'ADD available_seats :delta',
+        # Taking seats requires enough of them; giving seats back only requires the ride
+        'ConditionExpression': 'available_seats >= :needed' if seat_delta < 0 else 'attribute_exists(ride_id)',
+        'ExpressionAttributeValues': pagination.to_attribute_values(
+            {':delta': seat_delta, ':needed': -seat_delta} if seat_delta < 0 else {':delta': seat_delta}
+        ),
+        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+    }}
+
+
+def waitlist_item(transition):
+    """Transaction item queueing a request on its ride's waitlist, with what a later promotion needs."""
+    request = transition.request
+    entry = {
+        'ride_id': request['ride_id'],
+        'position': request['waitlist_position'],
+        'request_id': request['request_id'],
+        'rider_id': request['rider_id'],
+        'driver_id': request['driver_id'],
+        'seats_requested': int(request.get('seats_requested') or 1),
+        'created_at': request['created_at'],
+        'version': int(request.get('version') or 0) + 1  # The request's version once this transition commits
+    }
+    return {'Put': {
+        'TableName': WAITLIST_TABLE_NAME,
+        'Item': pagination.to_attribute_values(entry),
+        'ConditionExpression': 'attribute_not_exists(#position)',
+        'ExpressionAttributeNames': {'#position': 'position'}
+    }}
+
+
+def waitlist_delete_item(request):
+    """Transaction item taking a request off its ride's waitlist."""
+    return {'Delete': {
+        'TableName': WAITLIST_TABLE_NAME,
+        'Key': pagination.to_attribute_values({'ride_id': request['ride_id'], 'position': request['waitlist_position']}),
+        'ConditionExpression': 'attribute_exists(#position)',
+        'ExpressionAttributeNames': {'#position': 'position'}
+    }}
+
+
+def plan_promotions(ride_id, freed_seats=0):
+    """
+    Promotions for the head of a ride's waitlist that fit into its available_seats plus
+    freed_seats (seats the transitions committed alongside give back). Strictly FIFO:
+    stops at the first entry that doesn't fit rather than letting smaller ones jump it.
+    """
+    ride = dynamodb.Table(RIDES_TABLE_NAME).get_item(
+        Key={'ride_id': ride_id}, ConsistentRead=True, ProjectionExpression='available_seats'
+    ).get('Item')
+    if not ride:
+        return []
+    seats = int(ride.get('available_seats') or 0) + freed_seats
+
+    response = dynamodb.Table(WAITLIST_TABLE_NAME).query(
+        KeyConditionExpression=Key('ride_id').eq(ride_id),
+        ConsistentRead=True,
+        Limit=MAX_PROMOTIONS
+    )
+    promotions = []
+    for entry in response['Items']:
+        request = {**entry, 'ride_status': 'waitlisted', 'waitlist_position': entry['position']}
+        promotion = plan(request, 'promote')
+        if -promotion.seat_delta > seats:
+            break
+        seats += promotion.seat_delta
+        promotions.append(promotion)
+    return promotions
+
+
+def transition_items(*transitions):
+    """
+    Transaction items for transitions on one ride (e.g. a cancel and the promotions
+    riding on it): one combined seat update if seats move, then each request write
+    with its waitlist item. The combined update is conditional on available_seats >=
+    taken - freed, so promotions planned on a stale seat count fail instead of overbooking.
+    """
+    seat_delta = sum(t.seat_delta for t in transitions)
+    items = []
+    if any(t.seat_delta for t in transitions):  # Even when deltas cancel out, the ride must still exist
+        items.append(seat_item(transitions[0].request['ride_id'], seat_delta))
+    for t in transitions:
+        items.append(request_item(t))
+        if t.to_status == 'waitlisted':
+            items.append(waitlist_item(t))
+        elif t.from_status == 'waitlisted':
+            items.append(waitlist_delete_item(t.request))
+    return items
+
+
+def ride_updated_entry(request, action):
+    """EventBridge entry telling the rider their request was accepted, rejected or canceled."""
+    return event_publisher.event_entry("RideDetailsUpdated", {
+        "RideID": request['ride_id'],
+        "RequestID": request['request_id'],
+        "RiderID": request['rider_id'],
+        "DriverID": request['driver_id'],
+        "SeatsRequested": int(request.get('seats_requested', 1)),
+        "Timestamp": datetime.utcnow().isoformat(),
+        "notification_type": "Ride " + action,
+    })
+
+
+def seats_changed_items(transitions):
+    """
+    Outbox event for searchers watching the ride (push_seat_updates), only when the
+    transitions move its available_seats; a cancel whose seats are promoted away does not.
+    """
+    if not sum(t.seat_delta for t in transitions):
+        return []
+    return [event_publisher.outbox_put(event_publisher.event_entry("RideSeatsChanged", {
+        "RideID": transitions[0].request['ride_id'],
+        "SeatDelta": sum(t.seat_delta for t in transitions),
+        "Timestamp": datetime.utcnow().isoformat(),
+    }))]
+
+
+def commit(transition=None, event_items=(), ride_id=None):
+    """
+    Commit a transition with its outbox events. When it gives seats back, or when called
+    with only a ride_id after the ride's seats went up, the head of the ride's waitlist is
+    promoted into the seats then free in the same transaction, and each promoted rider
+    gets a "Ride promoted" event. Returns the promotions that committed.
+    """
+    transitions = [transition] if transition else []
+    ride_id = ride_id or transition.request['ride_id']
+    freed = sum(t.seat_delta for t in transitions)
+    for attempt in range(MAX_COMMIT_ATTEMPTS):
+        promotions = []
+        # The last attempt commits the transition alone, so a busy waitlist can't block a cancel
+        if (freed > 0 or not transitions) and (attempt < MAX_COMMIT_ATTEMPTS - 1 or not transitions):
+            promotions = plan_promotions(ride_id, freed)
+        if not transitions and not promotions:
+            return []
+        try:
+            execute(
+                transition_items(*transitions, *promotions)
+                + list(event_items)
+                + seats_changed_items(transitions + promotions)
+                + [event_publisher.outbox_put(ride_updated_entry(p.request, 'promoted')) for p in promotions]
+            )
+            return promotions
+        except BookingError as e:
+            # Another release may have promoted the same waitlist head, or the seats changed; read both again
+            if e.status_code not in (400, 409) or not promotions or attempt == MAX_COMMIT_ATTEMPTS - 1:
+                raise
+
+
+def execute(items):
+    """Run one transaction, turning failed conditions into BookingError."""
+    try:
+        dynamodb_client.transact_write_items(TransactItems=items)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        reasons = e.response.get('CancellationReasons', [])
+        for item, reason in zip(items, reasons):
+            if reason.get('Code') != 'ConditionalCheckFailed':
+                continue
+            operation = next(iter(item.values()))
+            if operation['TableName'] == RIDES_TABLE_NAME:
+                # Ride conditions only fail for a missing ride or, when it exists, too few seats
+                if 'Item' not in reason:
+                    raise BookingError(404, 'Ride not found')
+                raise BookingError(400, 'Not enough available seats')
+            raise BookingError(409, 'Request was updated by another action, reload and retry')
+        raise
+
+# Zipped with every Lambda that changes request status
+# zip function.zip book_ride.py booking_state.py event_publisher.py pagination.py
+# zip function.zip car_rides.py booking_state.py event_publisher.py pagination.py route_catalog.py route_catalog.json route_geometry.py
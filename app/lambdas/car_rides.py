@@ -1,24 +1,58 @@
+import csv
+import hashlib
+import io
 import json
+import threading
+import time
 import boto3
 import os
 import uuid
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr, Key
+from collections import OrderedDict
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from decimal import Decimal
 
-import requests
 import polyline
-import geohash2
 import traceback
 
+import booking_state
+import event_publisher
+import pagination
+import route_catalog
+import route_geometry
+
 # ✅ Modify the ride search (search_rides) to query rides based on geohashes instead of scanning all rides.
 # ✅ Optionally, add a GSI (Global Secondary Index) on route_geohashes to speed up queries.
 
 dynamodb = boto3.resource("dynamodb")
 TABLE_NAME = "RUCarRides"  # Ensure this is set in Lambda env variables
+USER_RIDES_INDEX = "user_id-departure_time-index"  # GSI: user_id (HASH), departure_time (RANGE)
+RIDE_REQUESTS_INDEX = "ride_id-created_at-index"  # RUBookRide GSI: ride_id (HASH), created_at (RANGE)
+IDEMPOTENCY_TABLE_NAME = "RUIdempotency"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+# An in-progress claim only blocks retries this long, so a Lambda killed mid-request doesn't lock the key for a day
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "120"))
 
 # Initialize AWS Lambda Client
 lambda_client = boto3.client("lambda", region_name="us-east-1")
 
+# Bulk import limits
+MAX_BULK_RIDES = int(os.getenv("MAX_BULK_RIDES", "100"))
+ROUTE_CONCURRENCY = int(os.getenv("ROUTE_CONCURRENCY", "4"))  # Parallel OSRM calls per bulk request
+BULK_WRITE_CHUNK = booking_state.TRANSACTION_LIMIT // 2  # Each ride commits with its RideCreated outbox event
+# Rides per asynchronous emissions invocation; one Groq call each, so a chunk finishes well inside the Lambda timeout
+EMISSIONS_BATCH_SIZE = int(os.getenv("EMISSIONS_BATCH_SIZE", "10"))
+
+# Per-container LRU cache of computed routes, keyed by rounded endpoints
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "256"))
+route_cache = OrderedDict()
+route_cache_lock = threading.Lock()  # bulk imports compute routes from several threads
+
+# Body keys that change a ride's route and therefore its geohashes and distance
+ROUTE_FIELDS = ["from_lat", "from_long", "to_lat", "to_long"]
+
 def convert_to_decimal(value):
     # """ Convert float to Decimal to comply with DynamoDB requirements. """
     if isinstance(value, float):
@@ -35,176 +69,420 @@ def decimal_to_float(obj):
     return obj
 
 
-def get_osrm_route(start_lat: float, start_lng: float, end_lat: float, end_lng: float):
-    """Get actual driving route using OSRM"""
-    print(f"Fetching route from OSRM: {start_lat}, {start_lng} to {end_lat}, {end_lng}")
-    base_url = "http://router.project-osrm.org/route/v1/driving"
-    url = f"{base_url}/{start_lng},{start_lat};{end_lng},{end_lat}"
-    
-    params = {
-        "overview": "full",
-        "geometries": "geojson"
+def compute_route(from_lat, from_long, to_lat, to_long):
+    """Fetch the OSRM route for a ride and reduce it to geohashes."""
+    # Rides between campus hubs reuse the precomputed catalog
+    catalog_route = route_catalog.lookup_route(from_lat, from_long, to_lat, to_long)
+    if catalog_route:
+        return catalog_route
+
+    cache_key = tuple(round(float(value), 5) for value in (from_lat, from_long, to_lat, to_long))
+    with route_cache_lock:
+        if cache_key in route_cache:
+            route_cache.move_to_end(cache_key)
+            return route_cache[cache_key]
+
+    route_data = route_geometry.get_osrm_route(from_lat, from_long, to_lat, to_long)
+    if not route_data:
+        return None
+
+    distance_km = route_data['distance'] / 1000
+    route = {
+        'route_geohashes': route_geometry.convert_route_to_geohashes(route_data['route'], distance_km),
+        'distance_km': distance_km,
+        'duration': route_data['duration']
     }
-    
+
+    with route_cache_lock:
+        route_cache[cache_key] = route
+        if len(route_cache) > ROUTE_CACHE_SIZE:
+            route_cache.popitem(last=False)
+    return route
+
+
+def build_ride_item(data, ride_id, route):
+    """Build the RUCarRides item for a ride from request data and its computed route."""
+    return {
+        "ride_id": ride_id,
+        "user_id": data.get("user_id"),
+        "car_id": data.get("car_id"),
+        "from_location": data.get("from_location"),
+        "from_lat": convert_to_decimal(data.get("from_lat")),
+        "from_long": convert_to_decimal(data.get("from_long")),
+        "to_location": data.get("to_location"),
+        "to_lat": convert_to_decimal(data.get("to_lat")),
+        "to_long": convert_to_decimal(data.get("to_long")),
+        "total_seats": data.get("total_seats"),
+        "available_seats": data.get("available_seats"),
+        "departure_time": data.get("departure_time"),
+        "pet_friendly": data.get("pet_friendly", False),
+        "trunk_space": data.get("trunk_space", False),
+        "air_conditioning": data.get("air_conditioning", False),
+        "wheelchair_access": data.get("wheelchair_access", False),
+        "note": data.get("note", ""),
+        "ride_price": convert_to_decimal(data.get("ride_price")),
+        "ride_status":data.get("ride_status", ""),
+        "distance_km": convert_to_decimal(route['distance_km']),
+        "route_geohashes": route['route_geohashes'],
+        "created_at": data.get("timestamp"),
+        "updated_at": data.get("timestamp"),
+        "version": 1  # Optimistic concurrency counter, bumped by update_ride
+    }
+
+
+def build_emissions_payload(item):
+    """Payload expected by the RUGroqCalCO2Emissions Lambda for one ride."""
+    return {
+        "ride_id": item["ride_id"],
+        "distance_km": float(item["distance_km"]),
+        "vehicle_type": "gasoline",
+        "passengers": int(item.get("total_seats") or 1),
+        "from_location": item.get("from_location"),
+        "to_location": item.get("to_location"),
+        "driver_id": item.get("user_id")
+    }
+
+
+def get_idempotency_key(event):
+    """Read the client's Idempotency-Key header (header names are case-insensitive)."""
+    headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    return headers.get("idempotency-key")
+
+
+def claim_idempotency_key(key, request_hash):
+    """
+    Conditionally record the key as in progress for IDEMPOTENCY_LEASE_SECONDS. Returns
+    (claim_id, None) when claimed, or (None, existing record) if it was already claimed.
+    """
+    table = dynamodb.Table(IDEMPOTENCY_TABLE_NAME)
+    now = int(time.time())
+    claim_id = str(uuid.uuid4())
     try:
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            if data["code"] == "Ok":
-                return {
-                    'route': data["routes"][0]["geometry"]["coordinates"],
-                    'duration': data["routes"][0]["duration"],
-                    'distance': data["routes"][0]["distance"]
-                }
-                # Remove this line that only returns coordinates
-                # return data["routes"][0]["geometry"]["coordinates"]
-    except Exception as e:
-        print(f"OSRM API error: {str(e)}")
-    return None
-
-def convert_route_to_geohashes(route, distance_km, precision=6):
-    """Convert a route to a reduced list of geohashes with dynamic step size."""
-    # Determine step size based on route distance
-    if distance_km < 10:
-        step = 3
-    elif distance_km < 50:
-        step = 5
-    elif distance_km < 200:
-        step = 10
-    else:
-        step = 15
-    
-    # Convert to geohashes and remove duplicates
-    unique_geohashes = list(set(
-        geohash2.encode(lat, lon, precision) 
-        for i, (lon, lat) in enumerate(route) 
-        if i % step == 0
-    ))
-    
-    print(f"Route stats:")
-    print(f"- Distance: {distance_km:.2f} km")
-    print(f"- Step size: {step}")
-    print(f"- Total points: {len(route)}")
-    print(f"- Unique geohashes: {len(unique_geohashes)}")
-    
-    return unique_geohashes
+        table.put_item(
+            Item={
+                "idempotency_key": key,
+                "request_hash": request_hash,
+                "idempotency_status": "in_progress",
+                "claim_id": claim_id,
+                "expires_at": now + IDEMPOTENCY_LEASE_SECONDS  # DynamoDB TTL attribute, extended once the ride commits
+            },
+            # TTL deletion is lazy, so treat expired records (and lapsed leases) as free
+            ConditionExpression="attribute_not_exists(idempotency_key) OR expires_at < :now",
+            ExpressionAttributeValues={":now": now}
+        )
+        return claim_id, None
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+    return None, table.get_item(Key={"idempotency_key": key}, ConsistentRead=True).get("Item")
+
+
+def idempotency_created_item(key, claim_id, ride_id):
+    """
+    Transaction item marking the key's ride as created, committed together with the ride.
+    Only the attempt still holding the claim can commit, so a lapsed lease can't create a second ride.
+    """
+    return {
+        "Update": {
+            "TableName": IDEMPOTENCY_TABLE_NAME,
+            "Key": pagination.to_attribute_values({"idempotency_key": key}),
+            "UpdateExpression": "SET idempotency_status = :created, ride_id = :ride_id, expires_at = :expires_at",
+            "ConditionExpression": "claim_id = :claim_id",
+            "ExpressionAttributeValues": pagination.to_attribute_values({
+                ":created": "created",
+                ":ride_id": ride_id,
+                ":claim_id": claim_id,
+                ":expires_at": int(time.time()) + IDEMPOTENCY_TTL_SECONDS
+            })
+        }
+    }
+
+
+def complete_idempotency_key(key, response):
+    """Store the final response so retries with the same key replay it."""
+    dynamodb.Table(IDEMPOTENCY_TABLE_NAME).update_item(
+        Key={"idempotency_key": key},
+        UpdateExpression="SET idempotency_status = :completed, #response = :response",
+        ExpressionAttributeNames={"#response": "response"},
+        ExpressionAttributeValues={":completed": "completed", ":response": json.dumps(response)}
+    )
+
+
+def release_idempotency_key(claim):
+    """
+    Forget a failed attempt so the client can retry it. Only this attempt's claim is
+    removed, and never once its ride committed (even if the commit response was lost).
+    """
+    try:
+        dynamodb.Table(IDEMPOTENCY_TABLE_NAME).delete_item(
+            Key={"idempotency_key": claim["key"]},
+            ConditionExpression="claim_id = :claim_id AND idempotency_status = :in_progress",
+            ExpressionAttributeValues={":claim_id": claim["claim_id"], ":in_progress": "in_progress"}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+
+
+def replay_idempotent_response(record, request_hash):
+    """Answer a retried request from its stored idempotency record."""
+    if record.get("request_hash") != request_hash:
+        return {"statusCode": 422, "body": json.dumps({"error": "Idempotency-Key was already used with a different request body"})}
+
+    if record.get("idempotency_status") == "created":
+        # The ride committed but the original call never stored its response
+        return {"statusCode": 200, "headers": {"Idempotent-Replayed": "true"},
+                "body": json.dumps({"message": "Ride created", "ride_id": record["ride_id"]})}
+
+    if record.get("idempotency_status") != "completed":
+        return {"statusCode": 409, "body": json.dumps({"error": "A request with this Idempotency-Key is still in progress"})}
+
+    response = json.loads(record["response"])
+    response["headers"] = {**response.get("headers", {}), "Idempotent-Replayed": "true"}
+    return response
 
 
 def create_ride(event, context):
+    claim = None  # {"key", "claim_id"}; create_ride_from_data adds "ride_id" once the ride has committed
     try:
         body = event.get("body", "{}")  # Ensure body is not None
         
         data = json.loads(body)
-        ride_id = str(uuid.uuid4())
-        
-        print(body)
-        print(data)
-        print(data.get("from_lat"))
-        print(convert_to_decimal(data.get("from_lat")))
-        
-        # When creating a ride
-        route_data = get_osrm_route(data.get("from_lat"), data.get("from_long"), data.get("to_lat"), data.get("to_long"))
-        distance_km = route_data['distance'] / 1000
-        route_geohashes = convert_route_to_geohashes(route_data['route'], distance_km)
-        
-        if not route_data:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 'Could not calculate route'})
-            }
-            
-        print("Generated route geohashes:", {
-            'count': len(route_geohashes),
-            'first_few': route_geohashes[:5],
-            'distance_km': distance_km
-        })
 
-        print("So much fo routes ", route_data)        
-        
-        table = dynamodb.Table(TABLE_NAME)
-        item = {
-            "ride_id": ride_id,
-            "user_id": data.get("user_id"),
-            "car_id": data.get("car_id"),
-            "from_location": data.get("from_location"),
-            "from_lat": convert_to_decimal(data.get("from_lat")),
-            "from_long": convert_to_decimal(data.get("from_long")),
-            "to_location": data.get("to_location"),
-            "to_lat": convert_to_decimal(data.get("to_lat")),
-            "to_long": convert_to_decimal(data.get("to_long")),
-            "total_seats": data.get("total_seats"),
-            "available_seats": data.get("available_seats"),
-            "departure_time": data.get("departure_time"),
-            "pet_friendly": data.get("pet_friendly", False),
-            "trunk_space": data.get("trunk_space", False),
-            "air_conditioning": data.get("air_conditioning", False),
-            "wheelchair_access": data.get("wheelchair_access", False),
-            "note": data.get("note", ""),
-            "ride_price": convert_to_decimal(data.get("ride_price")),
-            "ride_status":data.get("ride_status", ""),
-            "distance_km": convert_to_decimal(distance_km),
-            "route_geohashes": route_geohashes,
-            "created_at": data.get("timestamp"),
-            "updated_at": data.get("timestamp")
-        }
-        print("printing item...", item)
+        # Retried requests with the same Idempotency-Key get the original response back
+        idempotency_key = get_idempotency_key(event)
+        if idempotency_key:
+            request_hash = hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+            idempotency_key = f"create_ride#{data.get('user_id')}#{idempotency_key}"
+            claim_id, existing = claim_idempotency_key(idempotency_key, request_hash)
+            if not claim_id:
+                print(f"Replaying idempotent request {idempotency_key}")
+                return replay_idempotent_response(existing or {"request_hash": request_hash}, request_hash)
+            claim = {"key": idempotency_key, "claim_id": claim_id}
+
+        response = create_ride_from_data(data, claim)
+
+        if claim:
+            if response["statusCode"] < 300:
+                complete_idempotency_key(claim["key"], response)
+            else:
+                release_idempotency_key(claim)
+        return response
         
-        table.put_item(Item=item)
-        
-        
-        
-        # Define payload for Lambda B (Emission Calculator)
-        payload = {
-            "ride_id": ride_id,
-            "distance_km": float(distance_km),
-            "vehicle_type": "gasoline",
-            "passengers": int(data.get("total_seats", 1)),
-            "from_location": data.get("from_location"),
-            "to_location": data.get("to_location"),
-            "driver_id": data.get("user_id")
-        }
-        
-        # Invoke Lambda B (RUCarpool_CalculateEmissions)
-        response = lambda_client.invoke(
-            FunctionName="RUGroqCalCO2Emissions",  # Name of the target Lambda function
-            InvocationType="RequestResponse",  # Synchronous invocation
-            Payload=json.dumps(payload).encode("utf-8")
-        )
-        
-        # Read and parse response from Lambda B
-        response_payload = json.loads(response["Payload"].read().decode("utf-8"))
-        print("From CO2Emissions ", response_payload)
+    except json.JSONDecodeError:
+        return {"statusCode": 400, "body": json.dumps({"error": "Invalid JSON format"})}
+    except Exception as e:
+        error_message = str(e)
+        stack_trace = traceback.format_exc()
+        print(f"❌ Error: {error_message}")
+        print(f"❌ Stack Trace:\n{stack_trace}")
+        # Once the ride has committed the key stays "created", so a retry gets its ride_id instead of a second ride
+        if claim and "ride_id" not in claim:
+            release_idempotency_key(claim)
+        return {"statusCode": 500, "body": json.dumps({"error": error_message, "stack_trace": stack_trace})}
+
+
+def create_ride_from_data(data, claim=None):
+    ride_id = str(uuid.uuid4())
+    print(data)
+    
+    # When creating a ride
+    route = compute_route(data.get("from_lat"), data.get("from_long"), data.get("to_lat"), data.get("to_long"))
+    
+    if not route:
         return {
-            "statusCode": 200,
-            "body": json.dumps({
-                "message": "Carbon Emissions Caluclated",
-                "ride_id": ride_id,
-                "lambda_b_response": response_payload
-            })
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Could not calculate route'})
         }
         
+    print("Generated route geohashes:", {
+        'count': len(route['route_geohashes']),
+        'first_few': route['route_geohashes'][:5],
+        'distance_km': route['distance_km']
+    })
+    
+    item = build_ride_item(data, ride_id, route)
+    print("printing item...", item)
+    
+    # The ride, its RideCreated event and the idempotency record commit together;
+    # searchers subscribed to its cells get the event pushed
+    transact_items = [
+        {"Put": {"TableName": TABLE_NAME, "Item": pagination.to_attribute_values(item)}},
+        event_publisher.outbox_put(ride_changed_entry("RideCreated", ride_id, item["user_id"]))
+    ]
+    if claim:
+        transact_items.append(idempotency_created_item(claim["key"], claim["claim_id"], ride_id))
+    booking_state.dynamodb_client.transact_write_items(TransactItems=transact_items)
+    if claim:
+        claim["ride_id"] = ride_id
+    
+    # Invoke Lambda B (RUCarpool_CalculateEmissions)
+    response = lambda_client.invoke(
+        FunctionName="RUGroqCalCO2Emissions",  # Name of the target Lambda function
+        InvocationType="RequestResponse",  # Synchronous invocation
+        Payload=json.dumps(build_emissions_payload(item)).encode("utf-8")
+    )
+    
+    # Read and parse response from Lambda B
+    response_payload = json.loads(response["Payload"].read().decode("utf-8"))
+    print("From CO2Emissions ", response_payload)
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "message": "Carbon Emissions Caluclated",
+            "ride_id": ride_id,
+            "lambda_b_response": response_payload
+        })
+    }
+
+
+BULK_REQUIRED_FIELDS = ["user_id", "from_lat", "from_long", "to_lat", "to_long", "departure_time"]
+BULK_FLOAT_FIELDS = ["from_lat", "from_long", "to_lat", "to_long", "ride_price"]
+BULK_INT_FIELDS = ["total_seats", "available_seats"]
+BULK_BOOL_FIELDS = ["pet_friendly", "trunk_space", "air_conditioning", "wheelchair_access"]
+
+
+def parse_bulk_rows(event):
+    """Read bulk rides from a JSON body ({"rides": [...]} or {"csv": "..."}) or a raw text/csv body."""
+    headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    body = event.get("body") or ""
+
+    if "text/csv" in headers.get("content-type", ""):
+        csv_text = body
+    else:
+        data = json.loads(body or "{}")
+        if isinstance(data, list):
+            return data
+        if not isinstance(data, dict):
+            raise ValueError("Body must be a list of rides or an object with rides or csv")
+        if "csv" not in data:
+            rides = data.get("rides") or []
+            if not isinstance(rides, list):
+                raise ValueError("rides must be a list")
+            return rides
+        csv_text = data["csv"]
+
+    return [dict(row) for row in csv.DictReader(io.StringIO(csv_text))]
+
+
+def normalize_bulk_row(row):
+    """Coerce a bulk row (CSV values arrive as strings) into the shape create_ride expects."""
+    if not isinstance(row, dict):
+        raise ValueError("Each ride must be an object")
+    data = {k.strip(): v for k, v in row.items() if k and v not in (None, "")}
+
+    missing = [field for field in BULK_REQUIRED_FIELDS if field not in data]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    for field in BULK_FLOAT_FIELDS:
+        if field in data:
+            data[field] = float(data[field])
+    for field in BULK_INT_FIELDS:
+        if field in data:
+            data[field] = int(data[field])
+    for field in BULK_BOOL_FIELDS:
+        if isinstance(data.get(field), str):
+            data[field] = data[field].strip().lower() in ("true", "1", "yes", "y")
+
+    data.setdefault("available_seats", data.get("total_seats"))
+    data.setdefault("timestamp", datetime.utcnow().isoformat())
+    return data
+
+
+def endpoint_key(data):
+    """Key identifying a ride's endpoint pair so identical routes are only computed once."""
+    return tuple(round(data[field], 6) for field in ("from_lat", "from_long", "to_lat", "to_long"))
+
+
+def bulk_create_rides(event, context):
+    """Create many rides in one call (game days, airport runs) with per-row results."""
+    try:
+        try:
+            rows = parse_bulk_rows(event)
+        except ValueError as e:
+            return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
+
+        if not rows:
+            return {"statusCode": 400, "body": json.dumps({"error": "No rides provided"})}
+        if len(rows) > MAX_BULK_RIDES:
+            return {"statusCode": 400, "body": json.dumps({"error": f"At most {MAX_BULK_RIDES} rides per request"})}
+
+        results = [None] * len(rows)
+        valid_rows = []
+        for index, row in enumerate(rows):
+            try:
+                valid_rows.append((index, normalize_bulk_row(row)))
+            except (ValueError, TypeError) as e:
+                results[index] = {"row": index, "status": "error", "error": str(e)}
+
+        # 1️⃣ Route each distinct endpoint pair once, with bounded concurrency
+        unique_endpoints = {endpoint_key(data): data for _, data in valid_rows}
+        print(f"Bulk import: {len(valid_rows)} valid rows, {len(unique_endpoints)} distinct routes")
+
+        with ThreadPoolExecutor(max_workers=ROUTE_CONCURRENCY) as executor:
+            routes = dict(zip(
+                unique_endpoints.keys(),
+                executor.map(
+                    lambda d: compute_route(d["from_lat"], d["from_long"], d["to_lat"], d["to_long"]),
+                    unique_endpoints.values()
+                )
+            ))
+
+        rides = []  # (row index, item)
+        for index, data in valid_rows:
+            route = routes.get(endpoint_key(data))
+            if not route:
+                results[index] = {"row": index, "status": "error", "error": "Could not calculate route"}
+                continue
+            rides.append((index, build_ride_item(data, str(uuid.uuid4()), route)))
+
+        # 2️⃣ Write rides in transactions with their RideCreated outbox events, like create_ride;
+        # a failed chunk only fails its own rows
+        emissions_jobs = []
+        for start in range(0, len(rides), BULK_WRITE_CHUNK):
+            chunk = rides[start:start + BULK_WRITE_CHUNK]
+            transact_items = []
+            for _, item in chunk:
+                transact_items.append({"Put": {"TableName": TABLE_NAME, "Item": pagination.to_attribute_values(item)}})
+                transact_items.append(event_publisher.outbox_put(ride_changed_entry("RideCreated", item["ride_id"], item["user_id"])))
+            try:
+                booking_state.dynamodb_client.transact_write_items(TransactItems=transact_items)
+            except ClientError as e:
+                print(f"Bulk write of {len(chunk)} ride(s) failed: {str(e)}")
+                for index, _ in chunk:
+                    results[index] = {"row": index, "status": "error", "error": "Could not save ride"}
+                continue
+            for index, item in chunk:
+                emissions_jobs.append(build_emissions_payload(item))
+                results[index] = {"row": index, "status": "created", "ride_id": item["ride_id"]}
+
+        # 3️⃣ Fan emissions out over several asynchronous invocations, EMISSIONS_BATCH_SIZE rides each
+        for start in range(0, len(emissions_jobs), EMISSIONS_BATCH_SIZE):
+            lambda_client.invoke(
+                FunctionName="RUGroqCalCO2Emissions",
+                InvocationType="Event",  # Asynchronous invocation
+                Payload=json.dumps({"rides": emissions_jobs[start:start + EMISSIONS_BATCH_SIZE]}).encode("utf-8")
+            )
+
+        created = sum(1 for result in results if result["status"] == "created")
         return {
-            "statusCode": 201, 
+            "statusCode": 200 if created == len(rows) else 207,
             "body": json.dumps({
-                "ride_id": ride_id,
-                "geohash_count": len(route_geohashes)
+                "created": created,
+                "failed": len(rows) - created,
+                "results": results
             })
         }
-        
-        
-        
-        
-    except json.JSONDecodeError:
-        return {"statusCode": 400, "body": json.dumps({"error": "Invalid JSON format"})}
-    except json.JSONDecodeError:
-        return {"statusCode": 400, "body": json.dumps({"error": "Invalid JSON format"})}
+
+    except (json.JSONDecodeError, csv.Error):
+        return {"statusCode": 400, "body": json.dumps({"error": "Invalid JSON or CSV format"})}
     except Exception as e:
         error_message = str(e)
         stack_trace = traceback.format_exc()
         print(f"❌ Error: {error_message}")
         print(f"❌ Stack Trace:\n{stack_trace}")
-        return {"statusCode": 500, "body": json.dumps({"error": error_message, "stack_trace": stack_trace})}
-        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+        return {"statusCode": 500, "body": json.dumps({"error": error_message})}
     
 def get_all_rides(event, context):
     try:
@@ -229,52 +507,252 @@ def get_ride_by_id(event, context):
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
 
 def get_rides_by_user(event, context):
+    """
+    List a driver's rides ordered by departure_time, one page at a time.
+    Query parameters: status, from, to (ISO timestamps), limit, cursor.
+    Without from/to only upcoming rides are returned; with only to, every ride up to it.
+    """
     try:
         user_id = event["pathParameters"]["user_id"]
+        params = event.get("queryStringParameters") or {}
+
+        limit = pagination.parse_limit(params.get("limit"))
+        time_from = params.get("from")
+        time_to = params.get("to")
+        for name, value in (("from", time_from), ("to", time_to)):
+            if value:
+                try:
+                    datetime.fromisoformat(value)
+                except ValueError:
+                    raise ValueError(f"'{name}' must be an ISO timestamp")
+        # departure_time is compared as a string, so the range is checked the same way
+        if time_from and time_to and time_from > time_to:
+            raise ValueError("'from' must not be after 'to'")
+
+        key_condition = Key("user_id").eq(user_id)
+        if time_from and time_to:
+            key_condition &= Key("departure_time").between(time_from, time_to)
+        elif time_to:
+            key_condition &= Key("departure_time").lte(time_to)
+        else:
+            key_condition &= Key("departure_time").gte(time_from or datetime.utcnow().isoformat())
+
+        query_kwargs = {
+            "IndexName": USER_RIDES_INDEX,
+            "KeyConditionExpression": key_condition,
+            "ScanIndexForward": True  # Soonest departure first
+        }
+        if params.get("status"):
+            query_kwargs["FilterExpression"] = Attr("ride_status").eq(params["status"])
         
         table = dynamodb.Table(TABLE_NAME)
-        response = table.query(
-            IndexName="user_id-index",
-            KeyConditionExpression=Key("user_id").eq(user_id)
-        )
+        items, next_cursor = pagination.query_page(table, limit, params.get("cursor"), **query_kwargs)
         
-        return {"statusCode": 200, "body": json.dumps({"car_rides": decimal_to_float(response.get("Items", []))})}
+        return {"statusCode": 200, "body": json.dumps({
+            "car_rides": decimal_to_float(items),
+            "next_cursor": next_cursor
+        })}
+    except ValueError as e:
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
 
+def ride_changed_entry(detail_type, ride_id, driver_id, **detail):
+    """
+    EventBridge entry for a driver's change to a whole ride (RideCreated, RideUpdated, RideCanceled).
+    One event per change: the notification dispatcher broadcasts updates and cancellations
+    to the ride's riders, and push_seat_updates pushes new and updated rides to searchers.
+    """
+    return event_publisher.event_entry(detail_type, {
+        "RideID": ride_id,
+        "DriverID": driver_id,
+        "Timestamp": datetime.utcnow().isoformat(),
+        **detail
+    })
+
 def update_ride(event, context):
+    """
+    Update a ride, writing only attributes whose values actually change.
+    Route changes recompute geohashes through the route cache and only rewrite
+    route_geohashes/distance_km when the cell set differs. The write is
+    conditional on the ride's version, so concurrent edits fail with 409
+    instead of overwriting each other, and commits with one RideUpdated event
+    for the ride's accepted riders.
+    """
     try:
         ride_id = event["pathParameters"]["ride_id"]
         data = json.loads(event["body"])
         
         table = dynamodb.Table(TABLE_NAME)
-        update_expression = "SET " + ", ".join(f"{k} = :{k}" for k in data.keys())
-        expression_values = {f":{k}": v for k, v in data.items()}
-        expression_values[":updated_at"] = data.get("updated_at", "")
+        ride = table.get_item(Key={"ride_id": ride_id}, ConsistentRead=True).get("Item")
+        if not ride:
+            return {"statusCode": 404, "body": json.dumps({"error": "Ride not found"})}
+
+        # Clients may pin the version they edited; otherwise guard against writes since our read
+        try:
+            expected_version = int(data.pop("version", ride.get("version", 0)))
+        except (TypeError, ValueError):
+            return {"statusCode": 400, "body": json.dumps({"error": "version must be an integer"})}
+        for key in ("ride_id", "route_geohashes", "distance_km", "updated_at"):
+            data.pop(key, None)
+
+        changes = {k: convert_to_decimal(v) for k, v in data.items() if ride.get(k) != convert_to_decimal(v)}
+
+        added_cells, removed_cells = [], []
+        if any(field in changes for field in ROUTE_FIELDS):
+            endpoints = {field: changes.get(field, ride.get(field)) for field in ROUTE_FIELDS}
+            route = compute_route(endpoints["from_lat"], endpoints["from_long"], endpoints["to_lat"], endpoints["to_long"])
+            if not route:
+                return {"statusCode": 400, "body": json.dumps({"error": "Could not calculate route"})}
+
+            old_cells = set(ride.get("route_geohashes", []))
+            new_cells = set(route["route_geohashes"])
+            added_cells = sorted(new_cells - old_cells)
+            removed_cells = sorted(old_cells - new_cells)
+            if added_cells or removed_cells:
+                changes["route_geohashes"] = route["route_geohashes"]
+
+            distance_km = convert_to_decimal(route["distance_km"])
+            if distance_km != ride.get("distance_km"):
+                changes["distance_km"] = distance_km
+
+        if not changes:
+            return {"statusCode": 200, "body": json.dumps({"message": "Ride unchanged", "version": expected_version})}
+
+        changes["updated_at"] = datetime.utcnow().isoformat()
+        # Placeholders are numbered, so no body field can collide with :expected, :one or :zero
+        fields = list(changes)
+        names = {f"#f{i}": k for i, k in enumerate(fields)}
+        values = {f":v{i}": changes[k] for i, k in enumerate(fields)}
+        values.update({":expected": expected_version, ":one": 1, ":zero": 0})
+        version_condition = "version = :expected"
+        if expected_version == 0:  # Rides created before versioning have no version attribute yet
+            version_condition = "(attribute_not_exists(version) OR version = :expected)"
         
-        table.update_item(
-            Key={"ride_id": ride_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_values,
-            ReturnValues="UPDATED_NEW"
-        )
+        # The ride change and its RideUpdated broadcast commit together (published from the outbox)
+        booking_state.dynamodb_client.transact_write_items(TransactItems=[
+            {
+                "Update": {
+                    "TableName": TABLE_NAME,
+                    "Key": pagination.to_attribute_values({"ride_id": ride_id}),
+                    "UpdateExpression": "SET " + ", ".join(f"#f{i} = :v{i}" for i in range(len(fields))) +
+                                        ", version = if_not_exists(version, :zero) + :one",
+                    "ConditionExpression": f"attribute_exists(ride_id) AND {version_condition}",
+                    "ExpressionAttributeNames": names,
+                    "ExpressionAttributeValues": pagination.to_attribute_values(values)
+                }
+            },
+            event_publisher.outbox_put(ride_changed_entry("RideUpdated", ride_id, ride["user_id"],
+                                                          UpdatedFields=sorted(k for k in changes if k != "updated_at")))
+        ])
         
-        return {"statusCode": 200, "body": json.dumps({"message": "Ride updated successfully"})}
+        print(f"Updated ride {ride_id}: fields={sorted(changes)}, +{len(added_cells)}/-{len(removed_cells)} geohashes")
+
+        # More free seats: promote the head of the waitlist into them
+        promotions = []
+        if "available_seats" in changes and changes["available_seats"] > ride.get("available_seats", 0):
+            try:
+                promotions = booking_state.commit(ride_id=ride_id)
+            except booking_state.BookingError as e:
+                # The ride update stands; the waitlist is promoted on the next release of seats
+                print(f"Could not promote the waitlist of ride {ride_id}: {e.message}")
+
+        return {"statusCode": 200, "body": json.dumps({
+            "message": "Ride updated successfully",
+            "version": expected_version + 1,
+            "updated_fields": sorted(changes),
+            "geohashes_added": len(added_cells),
+            "geohashes_removed": len(removed_cells),
+            "promoted_request_ids": [p.request["request_id"] for p in promotions]
+        })}
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "TransactionCanceledException":
+            return {"statusCode": 409, "body": json.dumps({"error": "Ride was modified by another request, reload and retry"})}
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
 
+def get_open_requests(ride_id, consistent=False):
+    """
+    Every pending, accepted or waitlisted request for a ride, read from the RUBookRide ride
+    index. consistent=True re-reads each hit from the table, since the index can still show
+    requests that were just canceled.
+    """
+    table = dynamodb.Table(booking_state.BOOK_RIDE_TABLE_NAME)
+    query_kwargs = {
+        "IndexName": RIDE_REQUESTS_INDEX,
+        "KeyConditionExpression": Key("ride_id").eq(ride_id),
+        "FilterExpression": Attr("ride_status").is_in(["pending", "accepted", "waitlisted"])
+    }
+    items = pagination.query_all(table, **query_kwargs)
+    if consistent:
+        items = [table.get_item(Key={"request_id": item["request_id"]}, ConsistentRead=True).get("Item") for item in items]
+        items = [item for item in items if item and item["ride_status"] in ("pending", "accepted", "waitlisted")]
+    return items
+
 def delete_ride(event, context):
+    """
+    Delete a ride and cancel its open requests so none are left orphaned. Requests are
+    canceled first, in chunks that each carry a RideCanceled event for their riders; the
+    ride is deleted with the last chunk, so a failure leaves it in place for a retried
+    DELETE. A DELETE for a ride that is already gone still cancels requests left open.
+    """
     try:
         ride_id = event["pathParameters"]["ride_id"]
-        
-        table = dynamodb.Table(TABLE_NAME)
-        table.delete_item(Key={"ride_id": ride_id})
-        
-        return {"statusCode": 200, "body": json.dumps({"message": "Ride deleted successfully"})}
+        ride = dynamodb.Table(TABLE_NAME).get_item(Key={"ride_id": ride_id}, ConsistentRead=True).get("Item")
+        ride_delete = {
+            "Delete": {
+                "TableName": TABLE_NAME,
+                "Key": pagination.to_attribute_values({"ride_id": ride_id}),
+                "ConditionExpression": "attribute_exists(ride_id)"
+            }
+        }
+        # Request and waitlist item each, plus the chunk's event and (last chunk) the ride delete
+        chunk_size = (booking_state.TRANSACTION_LIMIT - 2) // 2
+
+        def cancel_items(chunk):
+            if not chunk:
+                return []
+            # Requests are canceled by the time the event is handled, so it names the riders itself
+            return [item for t in chunk for item in booking_state.transition_items(t)] + [
+                event_publisher.outbox_put(ride_changed_entry(
+                    "RideCanceled", ride_id, chunk[0].request["driver_id"],
+                    RiderIDs=list(dict.fromkeys(t.request["rider_id"] for t in chunk))
+                ))
+            ]
+
+        canceled = 0
+        for attempt in range(3):
+            try:
+                # Seats don't matter once the ride is gone, so cancels carry no seat update
+                transitions = [booking_state.plan(request, "cancel", release_seats=False)
+                               for request in get_open_requests(ride_id, consistent=attempt > 0)]
+                while len(transitions) > chunk_size:
+                    chunk, transitions = transitions[:chunk_size], transitions[chunk_size:]
+                    booking_state.execute(cancel_items(chunk))
+                    canceled += len(chunk)
+                items = cancel_items(transitions)
+                if ride:
+                    items.insert(0, ride_delete)
+                if items:
+                    booking_state.execute(items)
+                canceled += len(transitions)
+                break
+            except booking_state.BookingError as e:
+                if e.status_code != 409 or attempt == 2:
+                    raise
+                # A request changed since it was read; read again, consistently this time
+                time.sleep(0.1 * 2 ** attempt)
+
+        if not ride and not canceled:
+            return {"statusCode": 404, "body": json.dumps({"error": "Ride not found"})}
+        return {"statusCode": 200, "body": json.dumps({"message": "Ride deleted successfully", "requests_canceled": canceled})}
+    except booking_state.BookingError as e:
+        return {"statusCode": e.status_code, "body": json.dumps({"error": e.message})}
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
 
-# zip function.zip car_rides.py
+# zip function.zip car_rides.py booking_state.py event_publisher.py pagination.py route_catalog.py route_catalog.json route_geometry.py
 
     
 # aws lambda update-function-code \
@@ -307,6 +785,11 @@ def delete_ride(event, context):
 #     --zip-file fileb://function.zip \
 #     --region us-east-1
 
+# aws lambda update-function-code \
+#     --function-name RUBulkCreateRides \
+#     --zip-file fileb://function.zip \
+#     --region us-east-1
+
 
 
 
@@ -341,3 +824,8 @@ def delete_ride(event, context):
 #     --handler car_rides.delete_ride \
 #     --region us-east-1
 
+# aws lambda update-function-configuration \
+#     --function-name RUBulkCreateRides \
+#     --handler car_rides.bulk_create_rides \
+#     --region us-east-1
+
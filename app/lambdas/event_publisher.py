@@ -0,0 +1,120 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+event_bridge = boto3.client("events", region_name="us-east-1")
+
+EVENT_BUS_NAME = "RUCarpoolingEventBus"
+OUTBOX_TABLE_NAME = "RUEventOutbox"
+OUTBOX_TTL_SECONDS = int(os.getenv("OUTBOX_TTL_SECONDS", str(24 * 60 * 60)))
+EVENTS_PER_PUT = 10  # Max entries per EventBridge put_events call
+MAX_ATTEMPTS = int(os.getenv("EVENT_PUBLISH_MAX_ATTEMPTS", "3"))
+
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+
+def event_entry(detail_type, detail):
+    """Build an EventBridge entry on the carpooling bus."""
+    return {
+        "Source": "ru.carpooling",
+        "DetailType": detail_type,
+        "Detail": json.dumps(detail),
+        "EventBusName": EVENT_BUS_NAME
+    }
+
+
+def outbox_put(entry):
+    """
+    TransactWriteItems Put that records an EventBridge entry in the outbox table.
+    Added to the same transaction as the state change, so the event exists if and
+    only if the change committed; drain_outbox publishes it off the request path.
+    """
+    now = int(time.time())
+    item = {
+        "event_id": str(uuid.uuid4()),
+        "entry": json.dumps(entry),
+        "created_at": datetime.utcnow().isoformat(),
+        "expires_at": now + OUTBOX_TTL_SECONDS  # Stream has already delivered it; TTL just cleans up
+    }
+    return {
+        "Put": {
+            "TableName": OUTBOX_TABLE_NAME,
+            "Item": {k: serializer.serialize(v) for k, v in item.items()}
+        }
+    }
+
+
+class EventPublisher:
+    """Buffers EventBridge entries and sends them in batches of up to 10, retrying failed entries."""
+
+    def __init__(self, client=None):
+        self.client = client or event_bridge
+        self.buffer = []
+
+    def add(self, entry):
+        self.buffer.append(entry)
+
+    def flush(self):
+        """Publish everything buffered; returns the entries that still failed after MAX_ATTEMPTS."""
+        pending, self.buffer = self.buffer, []
+        failed = []
+        for start in range(0, len(pending), EVENTS_PER_PUT):
+            failed.extend(self._put_batch(pending[start:start + EVENTS_PER_PUT]))
+        return failed
+
+    def _put_batch(self, entries):
+        for attempt in range(MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(0.1 * 2 ** attempt)
+            try:
+                response = self.client.put_events(Entries=entries)
+            except Exception as e:
+                print(f"put_events failed (attempt {attempt + 1}): {str(e)}")
+                continue
+            if not response.get("FailedEntryCount"):
+                return []
+            # Results line up with the request entries; only resend the ones with an ErrorCode
+            entries = [entry for entry, result in zip(entries, response["Entries"]) if result.get("ErrorCode")]
+            print(f"{len(entries)} event(s) failed (attempt {attempt + 1}), retrying")
+        return entries
+
+
+def drain_outbox(event, context):
+    """
+    DynamoDB Streams handler for RUEventOutbox: publishes new outbox entries in
+    batches and reports the first unpublished record so Lambda retries from there.
+    """
+    records = [r for r in event.get("Records", []) if r.get("eventName") == "INSERT"]
+    publisher = EventPublisher()
+    sequence_numbers = {}
+    for record in records:
+        image = record["dynamodb"]["NewImage"]
+        entry = json.loads(deserializer.deserialize(image["entry"]))
+        publisher.add(entry)
+        sequence_numbers[id(entry)] = record["dynamodb"]["SequenceNumber"]
+
+    failed = publisher.flush()
+    print(f"Published {len(records) - len(failed)} of {len(records)} outbox event(s)")
+
+    if not failed:
+        return {"batchItemFailures": []}
+    # Stream batches are retried from the lowest reported sequence number onward
+    first_failed = min((sequence_numbers[id(entry)] for entry in failed), key=int)
+    return {"batchItemFailures": [{"itemIdentifier": first_failed}]}
+
+# zip function.zip event_publisher.py
+# aws lambda update-function-code \
+#     --function-name RUDrainEventOutbox \
+#     --zip-file fileb://function.zip \
+#     --region us-east-1
+
+# aws lambda update-function-configuration \
+#     --function-name RUDrainEventOutbox \
+#     --handler event_publisher.drain_outbox \
+#     --region us-east-1
@@ -0,0 +1,28 @@
+import json
+
+import boto3
+
+dynamodb = boto3.resource("dynamodb")
+counters_table = dynamodb.Table("RUNotificationCounters")  # PK user_id: unread_count
+
+def lambda_handler(event, context):
+    """Returns a user's unread notification count for the badge (one get_item, no inbox read)."""
+    try:
+        user_id = event["pathParameters"]["user_id"]  # Extract user_id from API path
+
+        item = counters_table.get_item(Key={"user_id": user_id}).get("Item") or {}
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps({"user_id": user_id, "unread_count": max(0, int(item.get("unread_count", 0)))})
+        }
+
+    except Exception as e:
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+# @app.get("/notifications/{user_id}/unread-count")
+# zip function.zip get_unread_count.py
+# aws lambda update-function-code \
+#     --function-name RUGetUnreadNotificationCount \
+#     --zip-file fileb://function.zip \
+#     --region us-east-1
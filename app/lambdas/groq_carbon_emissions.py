@@ -26,14 +26,15 @@ def lambda_handler(event, context):
     try:
         
         print("y evnet ", event)
+
+        # 📦 Batched job from bulk ride import: {"rides": [payload, ...]}
+        if "rides" in event:
+            return calculate_batch_emissions(event["rides"])
+
         # 1️⃣ Parse incoming request directly from event (not using body)
         ride_id = event.get("ride_id")
         distance_km = Decimal(str(event.get("distance_km", 0)))  # ✅ Convert float to Decimal
         vehicle_type = event.get("vehicle_type", "").lower()
-        passengers = int(event.get("passengers", 1))
-        from_location = event.get("from_location", "")
-        to_location = event.get("to_location", "")
-        driver_id = event.get("driver_id", "")
 
         # 2️⃣ Validate input
         if not ride_id or not distance_km or not vehicle_type:
@@ -42,90 +43,13 @@ def lambda_handler(event, context):
                 "body": json.dumps({"error": "Missing required fields."})
             }
 
-        prompt = (
-            f"Estimate the total carbon emissions for a carpool ride of {distance_km} km "
-            f"using a {vehicle_type} with {passengers} passengers.\n"
-            "Follow these instructions carefully:\n"
-            "1. DO NOT provide explanations.\n"
-            "2. DO NOT include calculations.\n"
-            "3. ONLY output results in the following format:\n"
-            "\n"
-            "Total CO₂ Emission: <NUMBER> kg CO₂\n"
-            "Per Passenger Emission: <NUMBER> kg CO₂\n"
-            "\n"
-            "Example Output:\n"
-            "Total CO₂ Emission: 9.3485 kg CO₂\n"
-            "Per Passenger Emission: 2.3371 kg CO₂\n"
-        )
-
-
-        # 4️⃣ Call Groq AI model using chat API
-        response = groq_client.chat.completions.create(
-            model="mixtral-8x7b-32768",  # Adjust based on available Groq models
-            messages=[{"role": "system", "content": prompt}],
-            max_tokens=100
-        )
-
-        print("Groq response:", response)
-
-        # 5️⃣ Extract text response from Groq API
-        ai_response_text = response.choices[0].message.content.strip()
-        print("AI Response:", ai_response_text)
-
-        # 6️⃣ Extract AI-predicted CO₂ emissions
-        total_emission, per_passenger_emission = extract_emission_values(ai_response_text)
-        
-        print("Total Emission:", total_emission)
-        print("Per Passenger Emission:", per_passenger_emission)
-
-        # 7️⃣ Store data in DynamoDB (Convert to Decimal)
-        table.put_item(
-            Item={
-                "ride_id": ride_id,
-                "driver_id": driver_id,
-                "distance_km": Decimal(str(distance_km)),  # ✅ Convert float to Decimal
-                "vehicle_type": vehicle_type,
-                "passengers": passengers,
-                "from_location": from_location,
-                "to_location": to_location,
-                "total_emission": Decimal(str(total_emission)),  # ✅ Convert float to Decimal
-                "per_passenger_emission": Decimal(str(per_passenger_emission))  # ✅ Convert float to Decimal
-            }
-        )
-        
-        
-        fun_summary_prompt = (
-            f"Write a fun summary for a carpool ride where {passengers} passengers "
-            f"traveled {distance_km:.1f} km using a {vehicle_type}. "
-            f"The total CO₂ emission was {total_emission:.2f} kg, and the per passenger emission was {per_passenger_emission:.2f} kg. "
-            "Keep it short, engaging, and add a fun fact at the end. "
-            "Ensure it fits within 1-2 sentences.\n"
-            "Example Output:\n"
-            "\"🚗💨 You carpooled {distance_km} km with {passengers} friends and saved {savings} kg of CO₂! 🌱 That’s like planting a tree!\""
-        )
-
-        
-        # Call Groq AI to generate the fun summary
-        summary_response = groq_client.chat.completions.create(
-            model="mixtral-8x7b-32768",
-            messages=[{"role": "system", "content": fun_summary_prompt}],
-            max_tokens=80  # Short response
-        )
-
-        # Extract AI-generated summary
-        fun_summary = summary_response.choices[0].message.content.strip()
-
-        # Print and return
-        print("🎉 Fun AI Summary:", fun_summary)
+        result = calculate_ride_emissions(event, include_summary=True)
 
         return {
             "statusCode": 200,
             "body": json.dumps({
-                "ride_id": ride_id,
-                "total_emission": float(total_emission),
-                "per_passenger_emission": float(per_passenger_emission),
-                "message": "Carbon footprint calculated successfully using Groq AI.",
-                "fun_summary": fun_summary  # 🎉 Fun AI-generated message!
+                **result,
+                "message": "Carbon footprint calculated successfully using Groq AI."
             })
         }
 
@@ -137,6 +61,118 @@ def lambda_handler(event, context):
         print(f"❌ Stack Trace:\n{stack_trace}")
         return {"statusCode": 500, "body": json.dumps({"error": error_message, "stack_trace": stack_trace})}
 
+def calculate_batch_emissions(rides):
+    """Calculate and store emissions for one chunk of a bulk import (EMISSIONS_BATCH_SIZE rides), one ride at a time."""
+    results = []
+    for ride in rides:
+        try:
+            if not ride.get("ride_id") or not ride.get("distance_km"):
+                raise ValueError("Missing required fields.")
+            # No one reads the fun summary for bulk-imported rides, so skip that LLM call
+            results.append(calculate_ride_emissions(ride, include_summary=False))
+        except Exception as e:
+            print(f"⚠️ Emissions failed for ride {ride.get('ride_id')}: {str(e)}")
+            results.append({"ride_id": ride.get("ride_id"), "error": str(e)})
+
+    return {"statusCode": 200, "body": json.dumps({"results": results})}
+
+def calculate_ride_emissions(ride, include_summary):
+    """Estimate emissions for one ride payload with Groq, store them and return the result."""
+    ride_id = ride.get("ride_id")
+    distance_km = Decimal(str(ride.get("distance_km", 0)))  # ✅ Convert float to Decimal
+    vehicle_type = (ride.get("vehicle_type") or "gasoline").lower()
+    passengers = int(ride.get("passengers", 1))
+    from_location = ride.get("from_location", "")
+    to_location = ride.get("to_location", "")
+    driver_id = ride.get("driver_id", "")
+
+    prompt = (
+        f"Estimate the total carbon emissions for a carpool ride of {distance_km} km "
+        f"using a {vehicle_type} with {passengers} passengers.\n"
+        "Follow these instructions carefully:\n"
+        "1. DO NOT provide explanations.\n"
+        "2. DO NOT include calculations.\n"
+        "3. ONLY output results in the following format:\n"
+        "\n"
+        "Total CO₂ Emission: <NUMBER> kg CO₂\n"
+        "Per Passenger Emission: <NUMBER> kg CO₂\n"
+        "\n"
+        "Example Output:\n"
+        "Total CO₂ Emission: 9.3485 kg CO₂\n"
+        "Per Passenger Emission: 2.3371 kg CO₂\n"
+    )
+
+
+    # 4️⃣ Call Groq AI model using chat API
+    response = groq_client.chat.completions.create(
+        model="mixtral-8x7b-32768",  # Adjust based on available Groq models
+        messages=[{"role": "system", "content": prompt}],
+        max_tokens=100
+    )
+
+    print("Groq response:", response)
+
+    # 5️⃣ Extract text response from Groq API
+    ai_response_text = response.choices[0].message.content.strip()
+    print("AI Response:", ai_response_text)
+
+    # 6️⃣ Extract AI-predicted CO₂ emissions
+    total_emission, per_passenger_emission = extract_emission_values(ai_response_text)
+    
+    print("Total Emission:", total_emission)
+    print("Per Passenger Emission:", per_passenger_emission)
+
+    # 7️⃣ Store data in DynamoDB (Convert to Decimal)
+    table.put_item(
+        Item={
+            "ride_id": ride_id,
+            "driver_id": driver_id,
+            "distance_km": Decimal(str(distance_km)),  # ✅ Convert float to Decimal
+            "vehicle_type": vehicle_type,
+            "passengers": passengers,
+            "from_location": from_location,
+            "to_location": to_location,
+            "total_emission": Decimal(str(total_emission)),  # ✅ Convert float to Decimal
+            "per_passenger_emission": Decimal(str(per_passenger_emission))  # ✅ Convert float to Decimal
+        }
+    )
+
+    result = {
+        "ride_id": ride_id,
+        "total_emission": float(total_emission),
+        "per_passenger_emission": float(per_passenger_emission)
+    }
+
+    if not include_summary:
+        return result
+    
+    fun_summary_prompt = (
+        f"Write a fun summary for a carpool ride where {passengers} passengers "
+        f"traveled {distance_km:.1f} km using a {vehicle_type}. "
+        f"The total CO₂ emission was {total_emission:.2f} kg, and the per passenger emission was {per_passenger_emission:.2f} kg. "
+        "Keep it short, engaging, and add a fun fact at the end. "
+        "Ensure it fits within 1-2 sentences.\n"
+        "Example Output:\n"
+        "\"🚗💨 You carpooled {distance_km} km with {passengers} friends and saved {savings} kg of CO₂! 🌱 That’s like planting a tree!\""
+    )
+
+    
+    # Call Groq AI to generate the fun summary
+    summary_response = groq_client.chat.completions.create(
+        model="mixtral-8x7b-32768",
+        messages=[{"role": "system", "content": fun_summary_prompt}],
+        max_tokens=80  # Short response
+    )
+
+    # Extract AI-generated summary
+    fun_summary = summary_response.choices[0].message.content.strip()
+
+    # Print and return
+    print("🎉 Fun AI Summary:", fun_summary)
+
+    result["fun_summary"] = fun_summary  # 🎉 Fun AI-generated message!
+    return result
+
 def extract_emission_values(response_text):
     """
     Extracts emission values from the AI-generated response text.
@@ -1,34 +1,50 @@
 import json
+
 import boto3
+from boto3.dynamodb.conditions import Key
+
+import pagination
 
 # AWS DynamoDB
 dynamodb = boto3.resource("dynamodb")
 notifications_table = dynamodb.Table("RUNotifications")
+INBOX_INDEX = "user_id-timestamp-index"  # GSI: user_id (HASH), timestamp (RANGE)
+UNREAD_INDEX = "user_id-unread_at-index"  # Sparse GSI: user_id (HASH), unread_at (RANGE), unread only
 
 def lambda_handler(event, context):
-    """Fetches notifications for a given user_id"""
+    """
+    Fetches one page of a user's notifications, newest first.
+    Optional ?limit= (default 20, max 100), ?cursor= (next_cursor of the previous page)
+    and ?unread_only=true, which reads the sparse unread index instead of the full inbox.
+    """
     try:
         user_id = event["pathParameters"]["user_id"]  # Extract user_id from API path
+        query_params = event.get("queryStringParameters") or {}
+        unread_only = str(query_params.get("unread_only", "")).lower() in ("true", "1")
 
-        response = notifications_table.query(
-            IndexName="UserIdIndex",  # Using GSI on user_id
-            KeyConditionExpression="user_id = :uid",
-            ExpressionAttributeValues={":uid": user_id}
+        limit = pagination.parse_limit(query_params.get("limit"))
+        items, next_cursor = pagination.query_page(
+            notifications_table, limit, query_params.get("cursor"),
+            IndexName=UNREAD_INDEX if unread_only else INBOX_INDEX,
+            KeyConditionExpression=Key("user_id").eq(user_id),
+            ScanIndexForward=False  # Newest first
         )
 
         return {
             "statusCode": 200,
-            "body": json.dumps({"notifications": response.get("Items", [])})
+            "body": json.dumps({"notifications": pagination.to_serializable(items), "next_cursor": next_cursor})
         }
 
+    except ValueError as e:
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
     except Exception as e:
         return {
             "statusCode": 500,
             "body": json.dumps({"error": str(e)})
         }
 
-# zip function.zip handle_fetch_not.py
+# zip function.zip handle_fetch_not.py pagination.py
 # aws lambda update-function-code \
 #     --function-name handle_fetch_notifications \
 #     --zip-file fileb://function.zip \
-#     --region us-east-1
\ No newline at end of file
+#     --region us-east-1
@@ -0,0 +1,317 @@
+import json
+import os
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+import notification_retention
+import pagination
+import recipient_cache
+import websocket_fanout
+
+# AWS Clients
+dynamodb = boto3.resource("dynamodb")
+ses_client = boto3.client("ses", region_name="us-east-1")
+
+# DynamoDB Tables
+notifications_table = dynamodb.Table("RUNotifications")
+counters_table = dynamodb.Table("RUNotificationCounters")  # PK user_id: unread_count, total_count
+digests_table = dynamodb.Table("RUNotificationDigests")  # PK user_id, SK "window" | "entry#<notification_id>"
+requests_table = dynamodb.Table("RUBookRide")
+RIDE_REQUESTS_INDEX = "ride_id-created_at-index"  # RUBookRide GSI: ride_id (HASH), created_at (RANGE)
+
+EMAIL_SOURCE = "noreply@rucarpool.com"
+DELIVERY_CONCURRENCY = int(os.getenv("NOTIFICATION_CONCURRENCY", "8"))  # Recipients delivered in parallel
+# Offline notifications are coalesced into one digest email per window; 0 emails each batch right away
+DIGEST_WINDOW_MINUTES = int(os.getenv("DIGEST_WINDOW_MINUTES", "10"))
+DIGEST_ENTRY_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# How each booking event becomes a notification: who receives it and what it says.
+# {sender} (the other party's name), {seats} and {fields} are filled from the event detail.
+# Ride-level events have no recipient field: they are broadcast to the ride's riders (see ride_recipients).
+NOTIFICATION_TEMPLATES = {
+    "RideRequested": {
+        "recipient": "DriverID",
+        "sender": "RiderID",
+        "notification_type": "Ride Request",
+        "message": "You have a new ride request from {sender}",
+        "subject": "New Ride Request",
+        "email": "You have a new ride request from {sender} for {seats} seat(s)."
+    },
+    "RideDetailsUpdated": {
+        "recipient": "RiderID",
+        "sender": "DriverID",
+        "notification_type": None,  # Taken from the event ("Ride accept", "Ride promoted", ...)
+        "message": "You have a new ride update from {sender}",
+        "subject": "Ride Update",
+        "email": "You have a new ride update from {sender} for {seats} seat(s)."
+    },
+    "RideUpdated": {
+        "recipient": None,
+        "sender": "DriverID",
+        "notification_type": "Ride changed",
+        "message": "{sender} changed your ride",
+        "subject": "Ride Changed",
+        "email": "{sender} changed your ride ({fields}). Check the app for the new details."
+    },
+    "RideCanceled": {
+        "recipient": None,
+        "sender": "DriverID",
+        "notification_type": "Ride canceled",
+        "message": "{sender} canceled your ride",
+        "subject": "Ride Canceled",
+        "email": "{sender} canceled your ride. Your request has been canceled."
+    },
+}
+
+
+def parse_record(record):
+    """
+    Return (detail_type, detail) for an SQS record. The body is either an EventBridge
+    envelope (rule target) or a bare event detail (older queue producers).
+    """
+    body = json.loads(record["body"])
+    if "detail" in body:
+        detail = body["detail"]
+        if isinstance(detail, str):  # Convert to dictionary if it's a string
+            detail = json.loads(detail)
+        return body.get("detail-type"), detail
+    # Bare details only come from the two booking events; updates carry a notification_type
+    return ("RideDetailsUpdated" if "notification_type" in body else "RideRequested"), body
+
+
+def ride_recipients(detail):
+    """
+    Riders a ride-level event goes to: the RiderIDs it carries (a canceled ride's requests
+    are already canceled), otherwise the ride's accepted riders from the RUBookRide ride index.
+    """
+    if "RiderIDs" in detail:
+        return list(dict.fromkeys(detail["RiderIDs"]))
+    query_kwargs = {
+        "IndexName": RIDE_REQUESTS_INDEX,
+        "KeyConditionExpression": Key("ride_id").eq(detail["RideID"]),
+        "FilterExpression": Attr("ride_status").eq("accepted"),
+        "ProjectionExpression": "rider_id"
+    }
+    riders = [item["rider_id"] for item in pagination.query_all(requests_table, **query_kwargs)]
+    return list(dict.fromkeys(riders))
+
+
+def recipients_of(detail_type, detail):
+    template = NOTIFICATION_TEMPLATES[detail_type]
+    return ride_recipients(detail) if template["recipient"] is None else [detail[template["recipient"]]]
+
+
+def build_notification(record, detail_type, detail, recipient, profiles):
+    """Turn one parsed SQS record into (notification item, email text) for one recipient from its event template."""
+    template = NOTIFICATION_TEMPLATES[detail_type]
+    sender = recipient_cache.display_name(detail[template["sender"]], profiles)
+
+    # Derived from the SQS message (and rider, for broadcasts), so a redelivered record overwrites instead of duplicating
+    source = record["messageId"] if template["recipient"] else f"{record['messageId']}:{recipient}"
+    timestamp = datetime.utcnow().isoformat()
+    notification = {
+        "notification_id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"rucarpool:notification:{source}")),
+        "user_id": recipient,
+        "message": template["message"].format(sender=sender),
+        "ride_id": detail["RideID"],
+        "request_id": detail.get("RequestID"),
+        "timestamp": timestamp,
+        "unread_at": timestamp,  # Sort key of the sparse unread index, removed when read
+        "notification_status": "unread",
+        "notification_type": template["notification_type"] or detail.get("notification_type", detail_type)
+    }
+    email = {
+        "subject": template["subject"],
+        "text": template["email"].format(sender=sender, seats=detail.get("SeatsRequested", 1),
+                                         fields=", ".join(detail.get("UpdatedFields", [])))
+    }
+    return notification, email
+
+
+def send_email(user_id, emails):
+    """Email everything queued for an offline user in one message."""
+    profile = recipient_cache.get_profile(user_id)  # Already cached by dispatch
+    if not profile or not profile.get("email"):
+        print(f"No email on file for {user_id}, skipping email")
+        return
+    subject = emails[0]["subject"] if len(emails) == 1 else f"{len(emails)} new RU Carpool notifications"
+    greeting = f"Hi {profile['full_name']},\n\n" if profile.get("full_name") else ""
+    ses_client.send_email(
+        Source=EMAIL_SOURCE,
+        Destination={"ToAddresses": [profile["email"]]},
+        Message={
+            "Subject": {"Data": subject},
+            "Body": {"Text": {"Data": greeting + "\n".join(email["text"] for email in emails)}}
+        }
+    )
+    print(f"Email notification sent to {profile['email']}")
+
+
+def queue_digest(user_id, work):
+    """
+    Queue an offline user's notifications for their digest. The first entry opens a
+    window of DIGEST_WINDOW_MINUTES; send_notification_digests emails everything
+    queued once it ends. A redelivered record rewrites the same entry.
+    """
+    now = datetime.utcnow()
+    with digests_table.batch_writer(overwrite_by_pkeys=["user_id", "sk"]) as batch:
+        for notification, email in work:
+            batch.put_item(Item={
+                "user_id": user_id,
+                "sk": f"entry#{notification['notification_id']}",
+                "timestamp": notification["timestamp"],
+                "subject": email["subject"],
+                "text": email["text"],
+                "expires_at": int(time.time()) + DIGEST_ENTRY_TTL_SECONDS
+            })
+    digests_table.update_item(
+        Key={"user_id": user_id, "sk": "window"},
+        UpdateExpression="SET window_ends_at = if_not_exists(window_ends_at, :ends), "
+                         "digest_status = :open, last_queued_at = :now",
+        ExpressionAttributeValues={
+            ":ends": (now + timedelta(minutes=DIGEST_WINDOW_MINUTES)).isoformat(),
+            ":open": "open",
+            ":now": now.isoformat()
+        }
+    )
+    print(f"Queued {len(work)} notification(s) for {user_id}'s digest")
+
+
+def increment_counts(user_id, count):
+    """Atomically add newly stored notifications to a user's unread badge and inbox size; returns the new inbox size."""
+    response = counters_table.update_item(
+        Key={"user_id": user_id},
+        UpdateExpression="ADD unread_count :count, total_count :count",
+        ExpressionAttributeValues={":count": count},
+        ReturnValues="UPDATED_NEW"
+    )
+    return int(response["Attributes"]["total_count"])
+
+
+def deliver(user_id, work):
+    """WebSocket to every device the user has open, otherwise the email digest. work is [(notification, email), ...]."""
+    payloads = [{k: notification[k] for k in ["notification_id", "message", "ride_id", "request_id", "notification_type"]}
+                for notification, _ in work]
+    if websocket_fanout.send_to_user(user_id, payloads):
+        return
+    if DIGEST_WINDOW_MINUTES > 0:
+        queue_digest(user_id, work)
+    else:
+        send_email(user_id, [email for _, email in work])
+
+
+def dispatch(event, context):
+    """
+    SQS handler: stores a batch of booking notifications with one batch writer, then
+    delivers them per recipient in parallel. Ride-level events (RideUpdated, RideCanceled)
+    fan out to one notification per rider. Only the records of recipients that failed
+    are reported in batchItemFailures, so SQS retries just those.
+    """
+    records = event.get("Records", [])
+    failed = set()
+
+    # 1️⃣ Parse records and resolve their recipients; a record that can't be parsed or resolved fails on its own
+    parsed = []
+    for record in records:
+        try:
+            detail_type, detail = parse_record(record)
+            parsed.append((record, detail_type, detail, recipients_of(detail_type, detail)))
+        except Exception as e:
+            print(f"Skipping record {record.get('messageId')}: {str(e)}")
+            failed.add(record["messageId"])
+
+    # 2️⃣ Names and emails of every recipient and sender in the batch, cache misses in one batch read
+    try:
+        profiles = recipient_cache.get_profiles(
+            user_id for _, detail_type, detail, recipients in parsed
+            for user_id in recipients + [detail[NOTIFICATION_TEMPLATES[detail_type]["sender"]]]
+        )
+    except Exception as e:
+        print(f"Error loading recipient profiles: {str(e)}")
+        profiles = {}  # Names fall back to user ids; offline emails are retried on their own lookup
+
+    by_recipient = defaultdict(list)  # user_id -> [(message_id, notification, email)]
+    for record, detail_type, detail, recipients in parsed:
+        for recipient in recipients:
+            notification, email = build_notification(record, detail_type, detail, recipient, profiles)
+            by_recipient[recipient].append((record["messageId"], notification, email))
+
+    # 3️⃣ Store first deliveries in one batch writer (25 items per request, unprocessed items retried).
+    # Redelivered records may already be stored, so they are written one by one only if missing,
+    # which keeps the unread counters from counting a notification twice.
+    redelivered = {r["messageId"] for r in records if int(r.get("attributes", {}).get("ApproximateReceiveCount", 1)) > 1}
+    new_counts = Counter()  # user_id -> notifications stored for the first time
+    try:
+        with notifications_table.batch_writer(overwrite_by_pkeys=["notification_id"]) as batch:
+            for user_id, work in by_recipient.items():
+                for message_id, notification, _ in work:
+                    if message_id in redelivered:
+                        continue
+                    batch.put_item(Item=notification)
+                    new_counts[user_id] += 1
+        for user_id, work in by_recipient.items():
+            for message_id, notification, _ in work:
+                if message_id not in redelivered:
+                    continue
+                try:
+                    notifications_table.put_item(Item=notification, ConditionExpression="attribute_not_exists(notification_id)")
+                    new_counts[user_id] += 1
+                except ClientError as e:
+                    if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                        raise
+    except Exception as e:
+        print(f"Error storing notifications: {str(e)}")
+        return {"batchItemFailures": [{"itemIdentifier": r["messageId"]} for r in records]}
+
+    # 4️⃣ Deliver per recipient in parallel; a slow or failing recipient only affects its own records
+    def deliver_recipient(item):
+        user_id, work = item
+        if new_counts[user_id]:
+            try:
+                # Over MAX_NOTIFICATIONS_PER_USER: the oldest notifications are evicted
+                notification_retention.enforce_cap(user_id, increment_counts(user_id, new_counts[user_id]))
+            except Exception as e:
+                # Not retried: the notifications are stored, so a redelivery would not count them again
+                print(f"Error updating counts for {user_id}: {str(e)}")
+        try:
+            deliver(user_id, [(notification, email) for _, notification, email in work])
+            return []
+        except Exception as e:
+            print(f"Error delivering to {user_id}: {str(e)}")
+            return [message_id for message_id, _, _ in work]
+
+    if by_recipient:
+        with ThreadPoolExecutor(max_workers=min(DELIVERY_CONCURRENCY, len(by_recipient))) as executor:
+            for message_ids in executor.map(deliver_recipient, by_recipient.items()):
+                failed.update(message_ids)
+
+    print(f"Dispatched {len(records) - len(failed)} of {len(records)} event(s) to {len(by_recipient)} recipient(s)")
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed]}
+
+# zip function.zip notification_dispatcher.py notification_retention.py pagination.py recipient_cache.py websocket_fanout.py
+# aws lambda update-function-code \
+#     --function-name RUNotificationDispatcher \
+#     --zip-file fileb://function.zip \
+#     --region us-east-1
+
+# Map the notifications queue with ReportBatchItemFailures so only failed records are retried
+# aws lambda create-event-source-mapping \
+#     --function-name RUNotificationDispatcher \
+#     --event-source-arn <notifications queue ARN> \
+#     --batch-size 25 \
+#     --function-response-types ReportBatchItemFailures \
+#     --region us-east-1
+
+# Route ride-level broadcasts from update_ride/delete_ride to the same queue
+# aws events put-rule \
+#     --name RURideChangedNotifications \
+#     --event-bus-name RUCarpoolingEventBus \
+#     --event-pattern '{"source": ["ru.carpooling"], "detail-type": ["RideUpdated", "RideCanceled"]}' \
+#     --region us-east-1
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+
+import pagination
+
+dynamodb = boto3.resource("dynamodb")
+s3_client = boto3.client("s3", region_name="us-east-1")
+
+notifications_table = dynamodb.Table("RUNotifications")
+counters_table = dynamodb.Table("RUNotificationCounters")  # PK user_id: unread_count, total_count
+INBOX_INDEX = "user_id-timestamp-index"  # GSI: user_id (HASH), timestamp (RANGE)
+
+MAX_NOTIFICATIONS_PER_USER = int(os.getenv("MAX_NOTIFICATIONS_PER_USER", "200"))
+READ_RETENTION_DAYS = int(os.getenv("READ_NOTIFICATION_RETENTION_DAYS", "30"))
+ARCHIVE_BUCKET = os.getenv("NOTIFICATION_ARCHIVE_BUCKET")  # Unset: evicted and expired notifications are dropped
+
+deserializer = TypeDeserializer()
+
+
+def read_expires_at():
+    """TTL (epoch seconds) for a notification being marked read now."""
+    return int(time.time()) + READ_RETENTION_DAYS * 24 * 60 * 60
+
+
+def archive(user_id, notifications, reason):
+    """Write notifications to NOTIFICATION_ARCHIVE_BUCKET as one JSON Lines object, if archiving is on."""
+    if not ARCHIVE_BUCKET or not notifications:
+        return
+    key = f"notifications/{user_id}/{datetime.utcnow().strftime('%Y/%m/%d')}/{reason}-{uuid.uuid4()}.jsonl"
+    s3_client.put_object(
+        Bucket=ARCHIVE_BUCKET,
+        Key=key,
+        Body="\n".join(json.dumps(pagination.to_serializable(n)) for n in notifications).encode("utf-8"),
+        ContentType="application/x-ndjson"
+    )
+    print(f"Archived {len(notifications)} {reason} notification(s) to s3://{ARCHIVE_BUCKET}/{key}")
+
+
+def take_from_counts(user_id, notifications):
+    """Subtract removed notifications from the user's total_count (and unread_count for unread ones)."""
+    if not notifications:
+        return
+    counters_table.update_item(
+        Key={"user_id": user_id},
+        UpdateExpression="ADD total_count :total_delta, unread_count :unread_delta",
+        ExpressionAttributeValues={
+            ":total_delta": -len(notifications),
+            ":unread_delta": -sum(1 for n in notifications if n.get("notification_status") == "unread")
+        }
+    )
+
+
+def enforce_cap(user_id, total_count):
+    """
+    Keep a user's inbox at MAX_NOTIFICATIONS_PER_USER by evicting the oldest notifications
+    (archived first when enabled). total_count is the counter the dispatcher just incremented;
+    TTL deletions are taken off it by archive_expired, so it is trusted instead of recounted.
+    Only notifications this call actually deleted are counted, so concurrent dispatchers
+    evicting the same oldest ones don't subtract them twice. Returns the number evicted.
+    """
+    excess = total_count - MAX_NOTIFICATIONS_PER_USER
+    if excess <= 0:
+        return 0
+
+    oldest, _ = pagination.query_page(
+        notifications_table, excess, None,
+        IndexName=INBOX_INDEX,
+        KeyConditionExpression=Key("user_id").eq(user_id),
+        ScanIndexForward=True  # Oldest first
+    )
+    evicted = []
+    for notification in oldest:
+        response = notifications_table.delete_item(
+            Key={"notification_id": notification["notification_id"]}, ReturnValues="ALL_OLD"
+        )
+        if "Attributes" in response:
+            evicted.append(response["Attributes"])
+
+    archive(user_id, evicted, "evicted")
+    take_from_counts(user_id, evicted)
+    print(f"Evicted {len(evicted)} oldest notification(s) for {user_id}")
+    return len(evicted)
+
+
+def archive_expired(event, context):
+    """
+    DynamoDB Streams handler for RUNotifications: archives read notifications that TTL
+    removed and takes them off the users' counters, which keeps total_count exact for
+    enforce_cap. Other stream records (inserts, updates, evictions) are ignored.
+    """
+    expired = defaultdict(list)
+    for record in event.get("Records", []):
+        if record.get("eventName") != "REMOVE":
+            continue
+        # TTL deletions are made by the DynamoDB service principal
+        if record.get("userIdentity", {}).get("principalId") != "dynamodb.amazonaws.com":
+            continue
+        image = record["dynamodb"].get("OldImage", {})
+        notification = {k: deserializer.deserialize(v) for k, v in image.items()}
+        expired[notification.get("user_id")].append(notification)
+
+    for user_id, notifications in expired.items():
+        archive(user_id, notifications, "expired")
+        take_from_counts(user_id, notifications)
+    return {"archived": sum(len(n) for n in expired.values())}
+
+# zip function.zip notification_retention.py pagination.py
+# aws lambda update-function-code \
+#     --function-name RUArchiveExpiredNotifications \
+#     --zip-file fileb://function.zip \
+#     --region us-east-1
+
+# aws lambda update-function-configuration \
+#     --function-name RUArchiveExpiredNotifications \
+#     --handler notification_retention.archive_expired \
+#     --region us-east-1
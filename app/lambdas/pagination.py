@@ -0,0 +1,85 @@
+import base64
+import json
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeSerializer
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+serializer = TypeSerializer()
+
+
+def to_serializable(value):
+    """Recursively converts Decimal values to int or float."""
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    elif isinstance(value, dict):
+        return {k: to_serializable(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [to_serializable(v) for v in value]
+    return value
+
+
+def to_attribute_values(values):
+    """Serialize values to DynamoDB JSON for a low-level client (transact_write_items)."""
+    return {k: serializer.serialize(v) for k, v in values.items()}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return to_serializable(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__} in a cursor")
+
+
+def encode_cursor(last_evaluated_key):
+    """Turn DynamoDB's LastEvaluatedKey into an opaque, URL-safe cursor (None when there are no more pages)."""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Turn a cursor from encode_cursor back into an ExclusiveStartKey; raises ValueError if it was tampered with."""
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")), parse_float=Decimal)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, dict):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a ?limit= query parameter, clamped to [1, maximum]."""
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+
+def query_page(table, limit, cursor, **query_kwargs):
+    """Run one page of table.query and return (items, next_cursor)."""
+    query_kwargs["Limit"] = limit
+    start_key = decode_cursor(cursor)
+    if start_key:
+        query_kwargs["ExclusiveStartKey"] = start_key
+
+    response = table.query(**query_kwargs)
+    return response.get("Items", []), encode_cursor(response.get("LastEvaluatedKey"))
+
+
+def query_all(table, **query_kwargs):
+    """Run table.query until LastEvaluatedKey runs out and return every item, for internal reads that need the full result."""
+    response = table.query(**query_kwargs)
+    items = response.get("Items", [])
+    while "LastEvaluatedKey" in response:
+        response = table.query(ExclusiveStartKey=response["LastEvaluatedKey"], **query_kwargs)
+        items.extend(response.get("Items", []))
+    return items
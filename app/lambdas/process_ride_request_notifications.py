@@ -1,105 +1,38 @@
 import json
-import boto3
-import uuid
-from datetime import datetime
+import os
 
-# AWS Clients
-dynamodb = boto3.resource("dynamodb")
-ses_client = boto3.client("ses", region_name="us-east-1")
-ws_client = boto3.client("apigatewaymanagementapi", endpoint_url="https://sy3ppk7bnh.execute-api.us-east-1.amazonaws.com/dev/")
+import notification_dispatcher
 
-# DynamoDB Tables
-notifications_table = dynamodb.Table("RUNotifications")
-connections_table = dynamodb.Table("RUWebSocketConnections")
-users_table = dynamodb.Table("RUCarpoolingUsers")  # Table storing user details
-
-def get_driver_email(driver_id):
-    """Fetch driver email from RUCarpoolingUsers table."""
-    response = users_table.get_item(Key={"user_id": driver_id})
-    if "Item" in response:
-        return response["Item"].get("email")
-    return None  # Return None if email not found
+# Booking events are ingested once, from the notifications SQS queue (store_notifications).
+# This EventBridge target only dispatches while that queue isn't wired; otherwise every event
+# would be stored under two ids, delivered twice and counted twice.
+INGESTION = os.getenv("NOTIFICATION_INGESTION", "sqs")  # "sqs" | "eventbridge"
 
 def lambda_handler(event, context):
-    try:
-        print("Received event:", json.dumps(event, indent=2))  # ✅ Debugging output
-
-        # ✅ Extract event details properly
-        detail = event["detail"]
-        if isinstance(detail, str):  # Convert to dictionary if it's a string
-            detail = json.loads(detail)
-
-        ride_id = detail["RideID"]
-        request_id = detail["RequestID"]
-        rider_id = detail["RiderID"]
-        driver_id = detail["DriverID"]
-        seats_requested = detail["SeatsRequested"]
-
-        # 📝 Step 1: Store Notification in DynamoDB
-        notification_id = str(uuid.uuid4())
-        notifications_table.put_item(Item={
-            "notification_id": notification_id,
-            "user_id": driver_id,
-            "message": f"You have a new ride request from {rider_id}",
-            "ride_id": ride_id,
-            "request_id": request_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "notification_status": "unread",
-            "notification_type": "Ride Request",
-        })
-        print(f"Notification stored for driver {driver_id}")
-        
-        
-        # 🚀 Step 2: Send WebSocket Notification (Real-Time)
-        
-        response = connections_table.query(
-            KeyConditionExpression="user_id = :user",
-            ExpressionAttributeValues={":user": str(driver_id)}
-        )
-        print("Is1 the driver online ", response)
-        items = response.get("Items", [])
-        print("Is the driver online ", items)
-        if items:
-            conn_id = items[0]["connection_id"]  # Use the first connection ID found
-            try:
-                ws_client.post_to_connection(
-                    ConnectionId=conn_id,
-                    Data=json.dumps({
-                        "notification_id": notification_id,
-                        "message": f"You have a new ride request from {rider_id}",
-                        "ride_id": ride_id,
-                        "request_id": request_id,
-                        "notification_type": "Ride Request",
-                    })
-                )
-            except ws_client.exceptions.GoneException:
-                print(f"Removing stale WebSocket connection for {driver_id}")
-                connections_table.delete_item(Key={"user_id": driver_id})
-            print(f"WebSocket notification sent to {driver_id}")
+    """EventBridge target: one booking event, handled as a one-record batch by the shared dispatcher."""
+    if INGESTION != "eventbridge":
+        print(f"Skipping event {event.get('id')}: notifications are ingested from the SQS queue")
+        return {"statusCode": 200, "body": "Notification handled by the queue"}
 
-        else:
-            # ✉️ Step 3: Send Email Notification via SES (If Driver is Offline)
-            driver_email = get_driver_email(driver_id)
-            if driver_email:
-                ses_client.send_email(
-                    Source="noreply@rucarpool.com",
-                    Destination={"ToAddresses": [driver_email]},
-                    Message={
-                        "Subject": {"Data": "New Ride Request"},
-                        "Body": {"Text": {"Data": f"You have a new ride request from {rider_id} for {seats_requested} seat(s)."}}
-                    }
-                )
-                print(f"Email notification sent to {driver_email}")
-
-        return {"statusCode": 200, "body": "Notification processed"}
-
-    except Exception as e:
-        print(f"Error processing notification: {str(e)}")
-        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+    record = {"messageId": event.get("id") or event["detail"]["RequestID"], "body": json.dumps(event)}
+    result = notification_dispatcher.dispatch({"Records": [record]}, context)
+    if result["batchItemFailures"]:
+        return {"statusCode": 500, "body": json.dumps({"error": "Notification delivery failed"})}
+    return {"statusCode": 200, "body": "Notification processed"}
 
     
-# zip function.zip process_ride_request_notifications.py
+# Deployed as both RUProcessRideRequestNoti and RUProcessRidenoti until their EventBridge targets are removed:
+# aws events remove-targets --rule <rule> --event-bus-name RUCarpoolingEventBus --ids <lambda target id> --region us-east-1
+# zip function.zip process_ride_request_notifications.py notification_dispatcher.py notification_retention.py pagination.py recipient_cache.py websocket_fanout.py
 # aws lambda update-function-code \
 #     --function-name RUProcessRideRequestNoti \
 #     --zip-file fileb://function.zip \
-#     --region us-east-1
\ No newline at end of file
+#     --region us-east-1
+# aws lambda update-function-code \
+#     --function-name RUProcessRidenoti \
+#     --zip-file fileb://function.zip \
+#     --region us-east-1
+# aws lambda update-function-configuration \
+#     --function-name RUProcessRidenoti \
+#     --handler process_ride_request_notifications.lambda_handler \
+#     --region us-east-1
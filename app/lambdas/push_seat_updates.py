@@ -0,0 +1,70 @@
+import json
+
+import boto3
+
+import pagination
+import search_subscriptions
+import websocket_fanout
+
+dynamodb = boto3.resource("dynamodb")
+rides_table = dynamodb.Table("RUCarRides")
+
+SEARCHABLE_STATUSES = {"scheduled", "active"}  # Same statuses POST /rides/search returns
+PAYLOAD_TYPES = {"RideSeatsChanged": "ride_seats_changed", "RideCreated": "ride_created", "RideUpdated": "ride_updated"}
+RIDE_FIELDS = ["ride_id", "from_location", "to_location", "departure_time", "available_seats",
+               "total_seats", "ride_price", "pet_friendly", "trunk_space", "wheelchair_access"]
+
+
+def lambda_handler(event, context):
+    """
+    EventBridge target for RideSeatsChanged (book_ride), RideCreated (create_ride) and
+    RideUpdated (update_ride): pushes the ride's current seats and details to every searcher
+    subscribed to its cells and time buckets. The ride is read when the event is handled,
+    so late or out-of-order events still push the latest count.
+    """
+    try:
+        detail = event["detail"]
+        if isinstance(detail, str):
+            detail = json.loads(detail)
+        detail_type = event.get("detail-type")
+
+        # 1️⃣ Current state of the ride
+        ride = rides_table.get_item(Key={"ride_id": detail["RideID"]}, ConsistentRead=True).get("Item")
+        if not ride or ride.get("ride_status") not in SEARCHABLE_STATUSES:
+            print(f"Ride {detail['RideID']} is gone or not searchable, nothing to push")
+            return {"statusCode": 200, "body": json.dumps({"pushed": 0})}
+
+        # 2️⃣ Searchers whose cells and departure window cover the ride
+        subscribers = search_subscriptions.subscribers_for_ride(ride)
+        if detail_type == "RideCreated":
+            # A new ride is only news to searchers it has room for
+            subscribers = [s for s in subscribers if s.get("seats_requested", 1) <= ride.get("available_seats", 0)]
+        if not subscribers:
+            return {"statusCode": 200, "body": json.dumps({"pushed": 0})}
+
+        # 3️⃣ One concurrent fan-out; closed connections drop their subscriptions
+        payload = pagination.to_serializable({
+            "type": PAYLOAD_TYPES.get(detail_type, "ride_seats_changed"),
+            "ride": {field: ride.get(field) for field in RIDE_FIELDS}
+        })
+        delivered, gone = websocket_fanout.send_to_connections([(subscriber, [payload]) for subscriber in subscribers])
+        search_subscriptions.unsubscribe(gone)
+
+        print(f"Pushed {detail_type} for ride {ride['ride_id']} to {len(delivered)} of {len(subscribers)} searcher(s)")
+        return {"statusCode": 200, "body": json.dumps({"pushed": len(delivered)})}
+
+    except Exception as e:
+        print(f"Error pushing seat update: {str(e)}")
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+# zip function.zip push_seat_updates.py pagination.py search_subscriptions.py websocket_fanout.py
+# aws lambda update-function-code \
+#     --function-name RUPushSeatUpdates \
+#     --zip-file fileb://function.zip \
+#     --region us-east-1
+
+# aws events put-rule \
+#     --name RURideSeatUpdates \
+#     --event-bus-name RUCarpoolingEventBus \
+#     --event-pattern '{"source": ["ru.carpooling"], "detail-type": ["RideSeatsChanged", "RideCreated", "RideUpdated"]}' \
+#     --region us-east-1
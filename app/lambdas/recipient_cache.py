@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import boto3
+
+dynamodb = boto3.resource("dynamodb")
+USERS_TABLE_NAME = "RUCarpoolingUsers"
+PROFILE_FIELDS = ["user_id", "email", "full_name"]
+
+# Contact details change rarely; a few minutes of staleness is fine for notifications
+CACHE_TTL_SECONDS = float(os.getenv("RECIPIENT_CACHE_TTL_SECONDS", "300"))
+CACHE_SIZE = int(os.getenv("RECIPIENT_CACHE_SIZE", "2048"))
+
+_cache = OrderedDict()  # user_id -> (expires_at, profile or None for unknown users), LRU order
+_cache_lock = threading.Lock()  # dispatchers look up recipients from several threads
+
+
+def _batch_get(user_ids):
+    """Fetch profiles with batch_get_item (100 keys per call), retrying unprocessed keys with backoff."""
+    profiles = {}
+    keys = [{"user_id": user_id} for user_id in user_ids]
+    for start in range(0, len(keys), 100):
+        request_items = {USERS_TABLE_NAME: {
+            "Keys": keys[start:start + 100],
+            "ProjectionExpression": ", ".join(f"#{f}" for f in PROFILE_FIELDS),
+            "ExpressionAttributeNames": {f"#{f}": f for f in PROFILE_FIELDS}
+        }}
+        attempt = 0
+        while request_items:
+            if attempt:  # Unprocessed keys mean the table is throttling; back off before asking again
+                time.sleep(0.1 * 2 ** min(attempt, 5))
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response["Responses"].get(USERS_TABLE_NAME, []):
+                profiles[item["user_id"]] = {"email": item.get("email"), "full_name": item.get("full_name")}
+            request_items = response.get("UnprocessedKeys") or {}
+            attempt += 1
+    return profiles
+
+
+def get_profiles(user_ids):
+    """
+    {user_id: {"email", "full_name"}} for the given users that exist. Fresh cache
+    entries are served from memory; all misses are filled with one batch read.
+    """
+    now = time.monotonic()
+    profiles, missing = {}, []
+    with _cache_lock:
+        for user_id in dict.fromkeys(user_ids):
+            entry = _cache.get(user_id)
+            if entry and entry[0] > now:
+                _cache.move_to_end(user_id)
+                if entry[1]:
+                    profiles[user_id] = entry[1]
+            else:
+                missing.append(user_id)
+
+    if missing:
+        fetched = _batch_get(missing)
+        with _cache_lock:
+            for user_id in missing:
+                _cache[user_id] = (now + CACHE_TTL_SECONDS, fetched.get(user_id))  # Unknown users are cached too
+                _cache.move_to_end(user_id)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+        profiles.update(fetched)
+    return profiles
+
+
+def get_profile(user_id):
+    """One user's {"email", "full_name"}, or None if the user doesn't exist."""
+    return get_profiles([user_id]).get(user_id)
+
+
+def display_name(user_id, profiles):
+    """A user's full name from already fetched profiles, falling back to the id."""
+    return (profiles.get(user_id) or {}).get("full_name") or user_id
+
+# Zipped with each Lambda that notifies users
+# zip function.zip notification_dispatcher.py notification_retention.py pagination.py recipient_cache.py websocket_fanout.py
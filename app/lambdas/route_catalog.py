@@ -0,0 +1,104 @@
+import json
+import os
+from math import radians, sin, cos, sqrt, atan2
+
+# Named hubs that most rides start or end at (lat, long)
+HUBS = {
+    "busch": (40.5235, -74.4633),  # Busch Student Center
+    "livingston": (40.5237, -74.4369),  # Livingston Student Center
+    "college_ave": (40.5034, -74.4525),  # College Avenue Student Center
+    "cook_douglass": (40.4808, -74.4362),  # Cook/Douglass Campus Center
+    "new_brunswick_station": (40.4967, -74.4455),  # New Brunswick NJ Transit station
+    "newark_penn_station": (40.7346, -74.1642),
+    "ewr": (40.6895, -74.1745),  # Newark Liberty International Airport
+    "rutgers_newark": (40.7411, -74.1740),  # Rutgers-Newark campus
+}
+
+# Endpoints within this distance of a hub reuse the hub's precomputed routes
+SNAP_RADIUS_KM = float(os.getenv("ROUTE_SNAP_RADIUS_KM", "0.4"))
+
+# Built at deploy time by running this file and zipped next to the Lambda handlers
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "route_catalog.json")
+
+_catalog = None  # Loaded once per container
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometers."""
+    lat1, lng1, lat2, lng2 = map(radians, [float(lat1), float(lng1), float(lat2), float(lng2)])
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    return 6371 * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def snap_to_hub(lat, lng):
+    """Return the name of the closest hub within SNAP_RADIUS_KM of the point, or None."""
+    if lat is None or lng is None:
+        return None
+    distance, hub = min((haversine_km(lat, lng, hub_lat, hub_lng), name) for name, (hub_lat, hub_lng) in HUBS.items())
+    return hub if distance <= SNAP_RADIUS_KM else None
+
+
+def load_catalog():
+    """Load the precomputed catalog; a missing file just means every lookup falls through to OSRM."""
+    global _catalog
+    if _catalog is None:
+        try:
+            with open(CATALOG_PATH) as f:
+                _catalog = json.load(f)
+        except FileNotFoundError:
+            print(f"Route catalog not found at {CATALOG_PATH}, using OSRM for all routes")
+            _catalog = {}
+    return _catalog
+
+
+def lookup_route(from_lat, from_lng, to_lat, to_lng):
+    """
+    Return the catalog entry {route_geohashes, distance_km, duration, from_hub, to_hub}
+    when both endpoints snap to different hubs, otherwise None.
+    """
+    from_hub = snap_to_hub(from_lat, from_lng)
+    to_hub = snap_to_hub(to_lat, to_lng)
+    if not from_hub or not to_hub or from_hub == to_hub:
+        return None
+
+    entry = load_catalog().get(f"{from_hub}|{to_hub}")
+    if not entry:
+        return None
+
+    print(f"Route catalog hit: {from_hub} -> {to_hub}")
+    return {**entry, "from_hub": from_hub, "to_hub": to_hub}
+
+
+def build_catalog():
+    """Compute OSRM routes and geohashes for every ordered pair of hubs and write route_catalog.json."""
+    from route_geometry import get_osrm_route, convert_route_to_geohashes  # Only needed to build
+
+    catalog = {}
+    for from_hub, (from_lat, from_lng) in HUBS.items():
+        for to_hub, (to_lat, to_lng) in HUBS.items():
+            if from_hub == to_hub:
+                continue
+
+            route_data = get_osrm_route(from_lat, from_lng, to_lat, to_lng)
+            if not route_data:
+                print(f"⚠️ Skipping {from_hub} -> {to_hub}: no OSRM route")
+                continue
+
+            distance_km = route_data['distance'] / 1000
+            catalog[f"{from_hub}|{to_hub}"] = {
+                "route_geohashes": convert_route_to_geohashes(route_data['route'], distance_km),
+                "distance_km": distance_km,
+                "duration": route_data['duration']
+            }
+
+    with open(CATALOG_PATH, "w") as f:
+        json.dump(catalog, f)
+    print(f"Wrote {len(catalog)} routes to {CATALOG_PATH}")
+
+
+if __name__ == "__main__":
+    build_catalog()
+
+# Rebuild before each deploy, then ship it with the handlers that use it
+# python3 route_catalog.py
+# zip function.zip car_rides.py booking_state.py event_publisher.py pagination.py route_catalog.py route_catalog.json route_geometry.py
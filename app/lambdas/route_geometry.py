@@ -0,0 +1,67 @@
+"""
+OSRM routing and geohash reduction shared by car_rides and the offline route catalog
+build. No AWS clients are created here, so route_catalog.py can run without credentials.
+"""
+import os
+
+import geohash2
+import requests
+
+OSRM_TIMEOUT_SECONDS = float(os.getenv("OSRM_TIMEOUT_SECONDS", "5"))
+
+
+def get_osrm_route(start_lat: float, start_lng: float, end_lat: float, end_lng: float):
+    """Get actual driving route using OSRM"""
+    print(f"Fetching route from OSRM: {start_lat}, {start_lng} to {end_lat}, {end_lng}")
+    base_url = "http://router.project-osrm.org/route/v1/driving"
+    url = f"{base_url}/{start_lng},{start_lat};{end_lng},{end_lat}"
+    
+    params = {
+        "overview": "full",
+        "geometries": "geojson"
+    }
+    
+    try:
+        response = requests.get(url, params=params, timeout=OSRM_TIMEOUT_SECONDS)
+        if response.status_code == 200:
+            data = response.json()
+            if data["code"] == "Ok":
+                return {
+                    'route': data["routes"][0]["geometry"]["coordinates"],
+                    'duration': data["routes"][0]["duration"],
+                    'distance': data["routes"][0]["distance"]
+                }
+                # Remove this line that only returns coordinates
+                # return data["routes"][0]["geometry"]["coordinates"]
+    except Exception as e:
+        print(f"OSRM API error: {str(e)}")
+    return None
+
+def convert_route_to_geohashes(route, distance_km, precision=6):
+    """Convert a route to a reduced list of geohashes with dynamic step size."""
+    # Determine step size based on route distance
+    if distance_km < 10:
+        step = 3
+    elif distance_km < 50:
+        step = 5
+    elif distance_km < 200:
+        step = 10
+    else:
+        step = 15
+    
+    # Convert to geohashes and remove duplicates
+    unique_geohashes = list(set(
+        geohash2.encode(lat, lon, precision) 
+        for i, (lon, lat) in enumerate(route) 
+        if i % step == 0
+    ))
+    
+    print(f"Route stats:")
+    print(f"- Distance: {distance_km:.2f} km")
+    print(f"- Step size: {step}")
+    print(f"- Total points: {len(route)}")
+    print(f"- Unique geohashes: {len(unique_geohashes)}")
+    
+    return unique_geohashes
+
+# Zipped with car_rides.py, and imported by route_catalog.py when building the catalog
@@ -1,3 +1,4 @@
+import os
 import traceback
 import requests
 import json
@@ -7,6 +8,11 @@ from datetime import datetime, timedelta
 from math import radians, sin, cos, sqrt, atan2
 from decimal import Decimal
 
+import route_catalog
+import search_subscriptions
+
+OSRM_TIMEOUT_SECONDS = float(os.getenv("OSRM_TIMEOUT_SECONDS", "5"))
+
 def get_osrm_route(start_lat: float, start_lng: float, end_lat: float, end_lng: float):
     """Get actual driving route using OSRM"""
     base_url = "http://router.project-osrm.org/route/v1/driving"
@@ -18,7 +24,7 @@ def get_osrm_route(start_lat: float, start_lng: float, end_lat: float, end_lng:
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = requests.get(url, params=params, timeout=OSRM_TIMEOUT_SECONDS)
         if response.status_code == 200:
             data = response.json()
             if data["code"] == "Ok":
@@ -100,24 +106,40 @@ def lambda_handler(event, context):
     """Lambda function to search for matching rides"""
     try:
         body = json.loads(event['body'])
+        if body.get('subscribe') and not body.get('connection_id'):
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'connection_id is required to subscribe'})
+            }
 
-        # 1️⃣ Get the user's planned route
-        user_route_data = get_osrm_route(
+        # 1️⃣ Get the user's planned route (campus hub pairs come from the precomputed catalog)
+        user_route_data = route_catalog.lookup_route(
             body['from_lat'], 
             body['from_long'],
             body['to_lat'], 
             body['to_long']
         )
-        
-        if not user_route_data:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 'Could not calculate route'})
-            }
 
-        # Convert route to geohashes
-        distance_km = user_route_data['distance'] / 1000
-        user_geohashes = convert_route_to_geohashes(user_route_data['route'], distance_km)
+        if user_route_data:
+            distance_km = user_route_data['distance_km']
+            user_geohashes = user_route_data['route_geohashes']
+        else:
+            user_route_data = get_osrm_route(
+                body['from_lat'], 
+                body['from_long'],
+                body['to_lat'], 
+                body['to_long']
+            )
+            
+            if not user_route_data:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'Could not calculate route'})
+                }
+
+            # Convert route to geohashes
+            distance_km = user_route_data['distance'] / 1000
+            user_geohashes = convert_route_to_geohashes(user_route_data['route'], distance_km)
 
         # 2️⃣ Calculate time window for ride matches
         departure_time = datetime.fromisoformat(body['departure_time'])
@@ -227,6 +249,19 @@ def lambda_handler(event, context):
             }
         }
 
+        # 7️⃣ Optionally keep the searcher's WebSocket connection updated on seats and new rides
+        if body.get('subscribe'):
+            response_body['subscription'] = {
+                'cells': search_subscriptions.subscribe(
+                    body['connection_id'],
+                    body.get('user_id'),
+                    user_geohashes,
+                    body['departure_time'],
+                    body['seats_requested']
+                ),
+                'expires_in_seconds': search_subscriptions.SUBSCRIPTION_TTL_SECONDS
+            }
+
         if 'debug' in body and body['debug']:
             response_body['debug'] = {
                 'searched_geohash': user_geohashes[0][:5],
@@ -252,7 +287,7 @@ def lambda_handler(event, context):
         }
 
 # Upload the Zip File to AWS Lambda
-# zip function.zip search_rides.py
+# zip function.zip search_rides.py pagination.py route_catalog.py route_catalog.json search_subscriptions.py
 # aws lambda update-function-code \
 #     --function-name RUSearchRides \
 #     --zip-file fileb://function.zip \
@@ -0,0 +1,97 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+import pagination
+
+dynamodb = boto3.resource("dynamodb")
+subscriptions_table = dynamodb.Table("RUSearchSubscriptions")  # PK cell_key, SK connection_id
+
+CELL_PRECISION = 5  # ~5 km cells; route geohashes are stored at precision 6
+BUCKET_HOURS = 2  # Matches the ±2 h departure window of POST /rides/search
+SUBSCRIPTION_TTL_SECONDS = int(os.getenv("SEARCH_SUBSCRIPTION_TTL_SECONDS", "900"))
+MAX_SUBSCRIPTION_CELLS = int(os.getenv("MAX_SUBSCRIPTION_CELLS", "100"))
+QUERY_CONCURRENCY = int(os.getenv("SUBSCRIPTION_QUERY_CONCURRENCY", "8"))
+
+
+def cells(route_geohashes):
+    """Distinct precision-5 cells covered by a route's geohashes."""
+    return sorted({geohash[:CELL_PRECISION] for geohash in route_geohashes})
+
+
+def time_bucket(departure_time):
+    """2-hour bucket of an ISO departure time, e.g. "2026-10-19T08" for 08:00-09:59."""
+    departure = datetime.fromisoformat(departure_time)
+    return f"{departure:%Y-%m-%dT}{departure.hour - departure.hour % BUCKET_HOURS:02d}"
+
+
+def cell_key(cell, bucket):
+    return f"{cell}#{bucket}"
+
+
+def subscribe(connection_id, user_id, route_geohashes, departure_time, seats_requested):
+    """
+    Subscribe a WebSocket connection to the cells of a search route in the bucket of its
+    departure time. Searching again overwrites the same items and extends their TTL.
+    Returns the number of cells subscribed.
+    """
+    search_cells = cells(route_geohashes)[:MAX_SUBSCRIPTION_CELLS]
+    bucket = time_bucket(departure_time)
+    expires_at = int(time.time()) + SUBSCRIPTION_TTL_SECONDS
+    with subscriptions_table.batch_writer(overwrite_by_pkeys=["cell_key", "connection_id"]) as batch:
+        for cell in search_cells:
+            batch.put_item(Item={
+                "cell_key": cell_key(cell, bucket),
+                "connection_id": connection_id,
+                "user_id": user_id,
+                "departure_time": departure_time,
+                "seats_requested": seats_requested,
+                "expires_at": expires_at  # TTL
+            })
+    return len(search_cells)
+
+
+def _query_cell(key):
+    return pagination.query_all(subscriptions_table, KeyConditionExpression=Key("cell_key").eq(key))
+
+
+def subscribers_for_ride(ride):
+    """
+    Live subscriptions whose search could return this ride: any of its cells, searched
+    for a departure within BUCKET_HOURS of the ride's. One per connection.
+    """
+    departure = datetime.fromisoformat(ride["departure_time"])
+    window = timedelta(hours=BUCKET_HOURS)
+    # A search at s matches rides in [s - 2h, s + 2h], so it sits in the ride's bucket or a neighbour
+    buckets = {time_bucket((departure + offset).isoformat()) for offset in (-window, timedelta(0), window)}
+    keys = [cell_key(cell, bucket) for cell in cells(ride.get("route_geohashes", [])) for bucket in sorted(buckets)]
+    if not keys:
+        return []
+
+    now = int(time.time())
+    subscribers = {}
+    with ThreadPoolExecutor(max_workers=min(QUERY_CONCURRENCY, len(keys))) as executor:
+        for items in executor.map(_query_cell, keys):
+            for item in items:
+                if item["expires_at"] <= now:  # TTL deletes lag; skip what has already expired
+                    continue
+                if abs(datetime.fromisoformat(item["departure_time"]) - departure) > window:
+                    continue
+                subscribers.setdefault(item["connection_id"], item)
+    return list(subscribers.values())
+
+
+def unsubscribe(subscriptions):
+    """Delete subscriptions of connections that are gone, in one batch; their other cells expire with TTL."""
+    if not subscriptions:
+        return
+    with subscriptions_table.batch_writer() as batch:
+        for subscription in subscriptions:
+            batch.delete_item(Key={"cell_key": subscription["cell_key"], "connection_id": subscription["connection_id"]})
+    print(f"Removed {len(subscriptions)} subscription(s) of closed connections")
+
+# Zipped with search_rides.py and push_seat_updates.py
@@ -0,0 +1,147 @@
+import json
+from datetime import datetime
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+import pagination
+import recipient_cache
+
+# AWS Clients
+dynamodb = boto3.resource("dynamodb")
+ses_client = boto3.client("ses", region_name="us-east-1")
+
+digests_table = dynamodb.Table("RUNotificationDigests")  # Filled by notification_dispatcher.queue_digest
+DUE_DIGESTS_INDEX = "digest_status-window_ends_at-index"  # GSI: digest_status (HASH), window_ends_at (RANGE)
+
+EMAIL_SOURCE = "noreply@rucarpool.com"
+TEMPLATE_NAME = "RUNotificationDigest"
+DESTINATIONS_PER_CALL = 50  # SES send_bulk_templated_email limit
+MAX_DIGEST_LINES = 20  # Longer digests end with "...and N more"
+
+DIGEST_TEMPLATE = {
+    "TemplateName": TEMPLATE_NAME,
+    "SubjectPart": "{{count}} new RU Carpool notification(s)",
+    "TextPart": "Hi {{name}},\n\n{{#each lines}}- {{this}}\n{{/each}}"
+                "{{#if more}}...and {{more}} more in the app.\n{{/if}}",
+    "HtmlPart": "<p>Hi {{name}},</p><ul>{{#each lines}}<li>{{this}}</li>{{/each}}</ul>"
+                "{{#if more}}<p>...and {{more}} more in the app.</p>{{/if}}"
+}
+DEFAULT_TEMPLATE_DATA = json.dumps({"name": "there", "count": 0, "lines": [], "more": 0})
+
+
+def create_template():
+    """Create (or update) the SES digest template; run once per deploy."""
+    try:
+        ses_client.create_template(Template=DIGEST_TEMPLATE)
+        print(f"Created SES template {TEMPLATE_NAME}")
+    except ses_client.exceptions.AlreadyExistsException:
+        ses_client.update_template(Template=DIGEST_TEMPLATE)
+        print(f"Updated SES template {TEMPLATE_NAME}")
+
+
+def close_digest(window, entries):
+    """Remove a user's sent entries, then their window unless more notifications were queued meanwhile."""
+    with digests_table.batch_writer() as batch:
+        for entry in entries:
+            batch.delete_item(Key={"user_id": entry["user_id"], "sk": entry["sk"]})
+    try:
+        digests_table.delete_item(
+            Key={"user_id": window["user_id"], "sk": "window"},
+            ConditionExpression="last_queued_at = :seen",
+            ExpressionAttributeValues={":seen": window["last_queued_at"]}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        print(f"New notifications for {window['user_id']} arrived, keeping the window for the next run")
+
+
+def lambda_handler(event, context):
+    """
+    Scheduled every minute: emails each user whose digest window has ended one digest
+    of everything queued for them, up to 50 users per SES send_bulk_templated_email call.
+    Failed destinations stay queued and are retried on the next run.
+    """
+    try:
+        now = datetime.utcnow().isoformat()
+        windows = pagination.query_all(
+            digests_table,
+            IndexName=DUE_DIGESTS_INDEX,
+            KeyConditionExpression=Key("digest_status").eq("open") & Key("window_ends_at").lte(now)
+        )
+        if not windows:
+            return {"statusCode": 200, "body": json.dumps({"digests_sent": 0})}
+
+        # 📇 Every due user's email and name in one cached batch lookup
+        profiles = recipient_cache.get_profiles(window["user_id"] for window in windows)
+
+        digests = []  # (window, entries, SES destination)
+        for window in windows:
+            user_id = window["user_id"]
+            entries = sorted(
+                pagination.query_all(digests_table,
+                                     KeyConditionExpression=Key("user_id").eq(user_id) & Key("sk").begins_with("entry#")),
+                key=lambda entry: entry["timestamp"]
+            )
+            profile = profiles.get(user_id) or {}
+            if not entries or not profile.get("email"):
+                print(f"Nothing to send to {user_id}, dropping their digest")
+                close_digest(window, entries)
+                continue
+
+            lines = [entry["text"] for entry in entries]
+            digests.append((window, entries, {
+                "Destination": {"ToAddresses": [profile["email"]]},
+                "ReplacementTemplateData": json.dumps({
+                    "name": profile.get("full_name") or "there",
+                    "count": len(lines),
+                    "lines": lines[:MAX_DIGEST_LINES],
+                    "more": max(0, len(lines) - MAX_DIGEST_LINES)
+                })
+            }))
+
+        # ✉️ One bulk call per 50 digests; SES reports a status per destination, in order
+        sent = 0
+        for start in range(0, len(digests), DESTINATIONS_PER_CALL):
+            chunk = digests[start:start + DESTINATIONS_PER_CALL]
+            try:
+                response = ses_client.send_bulk_templated_email(
+                    Source=EMAIL_SOURCE,
+                    Template=TEMPLATE_NAME,
+                    DefaultTemplateData=DEFAULT_TEMPLATE_DATA,
+                    Destinations=[destination for _, _, destination in chunk]
+                )
+            except Exception as e:
+                print(f"Error sending {len(chunk)} digest(s): {str(e)}")
+                continue
+            for (window, entries, _), status in zip(chunk, response["Status"]):
+                if status.get("Status") == "Success":
+                    close_digest(window, entries)
+                    sent += 1
+                else:
+                    print(f"Digest for {window['user_id']} failed: {status.get('Status')} {status.get('Error', '')}")
+
+        print(f"Sent {sent} of {len(digests)} digest(s)")
+        return {"statusCode": 200, "body": json.dumps({"digests_sent": sent})}
+
+    except Exception as e:
+        print(f"Error sending digests: {str(e)}")
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+
+if __name__ == "__main__":
+    create_template()
+
+# python3 send_notification_digests.py  (creates the SES template)
+# zip function.zip send_notification_digests.py pagination.py recipient_cache.py
+# aws lambda update-function-code \
+#     --function-name RUSendNotificationDigests \
+#     --zip-file fileb://function.zip \
+#     --region us-east-1
+
+# aws events put-rule \
+#     --name RUSendNotificationDigestsSchedule \
+#     --schedule-expression "rate(1 minute)" \
+#     --region us-east-1
@@ -1,36 +1,192 @@
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
 import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+import notification_retention
+import pagination
 
 dynamodb = boto3.resource("dynamodb")
+dynamodb_client = boto3.client("dynamodb")  # Transaction items are pre-serialized; the resource client would serialize them again
 notifications_table = dynamodb.Table("RUNotifications")
+counters_table = dynamodb.Table("RUNotificationCounters")  # PK user_id: unread_count
+UNREAD_INDEX = "user_id-unread_at-index"  # Sparse GSI: user_id (HASH), unread_at (RANGE), unread only
+MAX_BULK_IDS = 500
+BULK_CONCURRENCY = int(os.getenv("MARK_READ_CONCURRENCY", "8"))  # Parallel updates per bulk request
+
+# Only a still-unread notification of this user is changed; removing unread_at drops it from the unread index
+# and expires_at lets TTL delete it READ_NOTIFICATION_RETENTION_DAYS later
+MARK_READ_UPDATE = "SET notification_status = :read, read_at = :now, expires_at = :expires_at REMOVE unread_at"
+MARK_READ_CONDITION = "user_id = :user_id AND notification_status = :unread"
+
+def mark_read_values(user_id):
+    return {
+        ":read": "read", ":unread": "unread", ":user_id": user_id,
+        ":now": datetime.utcnow().isoformat(), ":expires_at": notification_retention.read_expires_at()
+    }
+
+def mark_read_item(notification_id, user_id):
+    """
+    Transaction item marking one of the user's notifications read, only if it is still
+    unread. Removing unread_at drops it from the sparse unread index.
+    """
+    return {
+        "Update": {
+            "TableName": notifications_table.name,
+            "Key": pagination.to_attribute_values({"notification_id": notification_id}),
+            "UpdateExpression": MARK_READ_UPDATE,
+            "ConditionExpression": MARK_READ_CONDITION,
+            "ExpressionAttributeValues": pagination.to_attribute_values(mark_read_values(user_id))
+        }
+    }
+
+def decrement_unread_item(user_id, count):
+    """Transaction item taking count off the user's unread badge, never below zero."""
+    return {
+        "Update": {
+            "TableName": counters_table.name,
+            "Key": pagination.to_attribute_values({"user_id": user_id}),
+            "UpdateExpression": "ADD unread_count :delta",
+            "ConditionExpression": "unread_count >= :count",
+            "ExpressionAttributeValues": pagination.to_attribute_values({":delta": -count, ":count": count})
+        }
+    }
 
 def lambda_handler(event, context):
-    """Marks a notification as read."""
+    """Marks a notification as read and takes it off the user's unread count in one transaction."""
     try:
         # ✅ Step 1: Parse request body
         body = json.loads(event["body"])
         notification_id = body.get("notification_id")
-        user_id = body.get("user_id")  # Include if your table uses user_id as a sort key
+        user_id = body.get("user_id")
 
         # ✅ Step 2: Validate input
         if not notification_id or not user_id:
             return {"statusCode": 400, "body": json.dumps({"error": "Missing notification_id or user_id"})}
 
-        # ✅ Step 3: Update notification status in DynamoDB
+        # ✅ Step 3: Mark read and decrement the counter together
+        try:
+            dynamodb_client.transact_write_items(TransactItems=[
+                mark_read_item(notification_id, user_id),
+                decrement_unread_item(user_id, 1)
+            ])
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "TransactionCanceledException":
+                raise
+            reasons = e.response.get("CancellationReasons", [])
+            if reasons and reasons[0].get("Code") == "ConditionalCheckFailed":
+                # Already read (or not this user's): nothing to change
+                return {"statusCode": 200, "body": json.dumps({"message": "Notification already read"})}
+            if len(reasons) > 1 and reasons[1].get("Code") == "ConditionalCheckFailed":
+                # Counter missing or already zero: still mark the notification read
+                dynamodb_client.transact_write_items(TransactItems=[mark_read_item(notification_id, user_id)])
+            else:
+                raise
+
+        return {"statusCode": 200, "body": json.dumps({"message": "Notification marked as read"})}
+
+    except Exception as e:
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+def get_unread_ids_before(user_id, before):
+    """Ids of the user's unread notifications older than before, from the sparse unread index."""
+    query_kwargs = {
+        "IndexName": UNREAD_INDEX,
+        "KeyConditionExpression": Key("user_id").eq(user_id) & Key("unread_at").lt(before),
+        "ProjectionExpression": "notification_id"
+    }
+    return [item["notification_id"] for item in pagination.query_all(notifications_table, **query_kwargs)]
+
+def mark_read(notification_id, user_id):
+    """Mark one notification read: "read", "skipped" (already read or not the user's) or "failed"."""
+    try:
         notifications_table.update_item(
-            Key={"notification_id": notification_id, "user_id": user_id},  # Include user_id if required
-            UpdateExpression="SET #s = :new_status",
-            ExpressionAttributeNames={"#s": "status"},  # Ensure this matches your actual field name
-            ExpressionAttributeValues={":new_status": "read"}
+            Key={"notification_id": notification_id},
+            UpdateExpression=MARK_READ_UPDATE,
+            ConditionExpression=MARK_READ_CONDITION,
+            ExpressionAttributeValues=mark_read_values(user_id)
         )
+        return "read"
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return "skipped"
+        print(f"Error marking {notification_id} read: {str(e)}")
+        return "failed"
 
-        return {"statusCode": 200, "body": json.dumps({"message": "Notification marked as read"})}
+def decrement_unread_count(user_id, count):
+    """Take count off the unread badge in one update; a counter that drifted below it is reset to zero."""
+    if not count:
+        return
+    try:
+        counters_table.update_item(
+            Key={"user_id": user_id},
+            UpdateExpression="ADD unread_count :delta",
+            ConditionExpression="unread_count >= :count",
+            ExpressionAttributeValues={":delta": -count, ":count": count}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        counters_table.update_item(
+            Key={"user_id": user_id},
+            UpdateExpression="SET unread_count = :zero",
+            ExpressionAttributeValues={":zero": 0}
+        )
+
+# @app.patch("/notifications/mark-read/bulk")
+def bulk_mark_read(event, context):
+    """
+    Marks many notifications read at once.
+    Body: {"user_id": ..., "notification_ids": [...]} or {"user_id": ..., "before": "<ISO timestamp>"}
+    ("all unread before"). Updates run with bounded parallelism, then the unread count
+    is adjusted once by the number that actually changed.
+    """
+    try:
+        body = json.loads(event.get("body") or "{}")
+        user_id = body.get("user_id")
+        if not user_id or not (body.get("notification_ids") or body.get("before")):
+            return {"statusCode": 400, "body": json.dumps({"error": "user_id and notification_ids or before are required"})}
 
+        if body.get("notification_ids"):
+            notification_ids = list(dict.fromkeys(body["notification_ids"]))
+            if len(notification_ids) > MAX_BULK_IDS:
+                return {"statusCode": 400, "body": json.dumps({"error": f"At most {MAX_BULK_IDS} notification_ids per request"})}
+        else:
+            notification_ids = get_unread_ids_before(user_id, body["before"])
+
+        outcomes = []
+        if notification_ids:
+            with ThreadPoolExecutor(max_workers=min(BULK_CONCURRENCY, len(notification_ids))) as executor:
+                outcomes = list(executor.map(lambda notification_id: mark_read(notification_id, user_id), notification_ids))
+
+        # One counter adjustment for the whole request, by what actually changed
+        marked = outcomes.count("read")
+        decrement_unread_count(user_id, marked)
+
+        failed_ids = [i for i, outcome in zip(notification_ids, outcomes) if outcome == "failed"]
+        return {"statusCode": 207 if failed_ids else 200, "body": json.dumps({
+            "message": "Notifications marked as read",
+            "marked_read": marked,
+            "already_read": outcomes.count("skipped"),
+            "failed_ids": failed_ids
+        })}
+
+    except json.JSONDecodeError:
+        return {"statusCode": 400, "body": json.dumps({"error": "Invalid JSON format"})}
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
-    
-# zip function.zip update_noti.py
+
+# zip function.zip update_noti.py notification_retention.py pagination.py
 # aws lambda update-function-code \
 #     --function-name RUUpdateNotificationStatusHandler \
 #     --zip-file fileb://function.zip \
-#     --region us-east-1
\ No newline at end of file
+#     --region us-east-1
+
+# aws lambda update-function-configuration \
+#     --function-name RUBulkMarkNotificationsRead \
+#     --handler update_noti.bulk_mark_read \
+#     --region us-east-1
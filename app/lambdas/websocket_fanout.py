@@ -0,0 +1,99 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+
+import pagination
+
+WEBSOCKET_ENDPOINT = os.getenv("WEBSOCKET_ENDPOINT", "https://sy3ppk7bnh.execute-api.us-east-1.amazonaws.com/dev/")
+SEND_TIMEOUT_SECONDS = float(os.getenv("WEBSOCKET_SEND_TIMEOUT_SECONDS", "2"))
+FANOUT_CONCURRENCY = int(os.getenv("WEBSOCKET_FANOUT_CONCURRENCY", "16"))
+
+# No retries and short timeouts: a dead or slow connection must not hold a send past its budget
+ws_client = boto3.client(
+    "apigatewaymanagementapi",
+    endpoint_url=WEBSOCKET_ENDPOINT,
+    config=Config(connect_timeout=SEND_TIMEOUT_SECONDS, read_timeout=SEND_TIMEOUT_SECONDS,
+                  retries={"total_max_attempts": 1})
+)
+dynamodb = boto3.resource("dynamodb")
+connections_table = dynamodb.Table("RUWebSocketConnections")  # PK user_id, SK connection_id
+
+executor = ThreadPoolExecutor(max_workers=FANOUT_CONCURRENCY)  # Shared by every send in the container
+
+
+def get_connections(user_id):
+    """Every live connection of a user (one per open device)."""
+    return pagination.query_all(connections_table, KeyConditionExpression=Key("user_id").eq(str(user_id)))
+
+
+def _send(connection, payloads):
+    for payload in payloads:
+        ws_client.post_to_connection(ConnectionId=connection["connection_id"], Data=json.dumps(payload))
+
+
+def send_to_connections(sends):
+    """
+    Post to many connections concurrently. sends is [(connection, payloads), ...]. Each post
+    is bounded by the client's SEND_TIMEOUT_SECONDS connect/read timeouts once it starts; the
+    overall wait allows for sends queued behind the pool, so only a stuck send is cut off.
+    Returns (delivered, gone): the connections that took all their payloads and the ones
+    API Gateway reports as disconnected.
+    """
+    futures = {executor.submit(_send, connection, payloads): connection for connection, payloads in sends}
+    if not futures:
+        return [], []
+    rounds = -(-len(futures) // FANOUT_CONCURRENCY)  # Pool passes needed to start every send
+    per_send = 2 * SEND_TIMEOUT_SECONDS * max(len(payloads) for _, payloads in sends)  # Connect + read per payload
+    done, not_done = wait(futures, timeout=rounds * per_send)
+
+    delivered, gone = [], []
+    for future in done:
+        error = future.exception()
+        if error is None:
+            delivered.append(futures[future])
+        elif isinstance(error, ws_client.exceptions.GoneException):
+            gone.append(futures[future])
+        else:
+            print(f"WebSocket send to {futures[future]['connection_id']} failed: {str(error)}")
+    for future in not_done:
+        future.cancel()
+        print(f"WebSocket send to {futures[future]['connection_id']} timed out")
+    return delivered, gone
+
+
+def prune_connections(connections):
+    """Delete stale connections in one batch instead of one delete per connection."""
+    if not connections:
+        return
+    with connections_table.batch_writer() as batch:
+        for connection in connections:
+            batch.delete_item(Key={"user_id": connection["user_id"], "connection_id": connection["connection_id"]})
+    print(f"Pruned {len(connections)} stale WebSocket connection(s)")
+
+
+def send_to_users(payloads_by_user):
+    """
+    Fan {user_id: [payload, ...]} out to all connections of all users at once, then prune
+    every gone connection together. Returns the set of user_ids reached on at least one device.
+    """
+    user_ids = list(payloads_by_user)
+    connections = [connection for user_connections in executor.map(get_connections, user_ids)
+                   for connection in user_connections]
+
+    delivered, gone = send_to_connections(
+        [(connection, payloads_by_user[connection["user_id"]]) for connection in connections]
+    )
+    prune_connections(gone)
+    return {connection["user_id"] for connection in delivered}
+
+
+def send_to_user(user_id, payloads):
+    """Send payloads to every device a user has open; returns True if any device took them."""
+    return user_id in send_to_users({user_id: payloads})
+
+# Zipped with each Lambda that pushes over WebSocket
+# zip function.zip notification_dispatcher.py notification_retention.py pagination.py recipient_cache.py websocket_fanout.py
@@ -0,0 +1,103 @@
+import boto3
+
+# Initialize DynamoDB resource
+dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+TABLE_NAME = "RUBookRide"
+
+ATTRIBUTE_DEFINITIONS = [
+    {'AttributeName': 'request_id', 'AttributeType': 'S'},  # String (UUID)
+    {'AttributeName': 'ride_id', 'AttributeType': 'S'},  # String (UUID)
+    {'AttributeName': 'created_at', 'AttributeType': 'S'},  # String (ISO Timestamp)
+    {'AttributeName': 'driver_id', 'AttributeType': 'S'},  # String (UUID)
+    {'AttributeName': 'status_created', 'AttributeType': 'S'},  # String "<ride_status>#<created_at>"
+    {'AttributeName': 'rider_id', 'AttributeType': 'S'},  # String (UUID)
+]
+
+GLOBAL_SECONDARY_INDEXES = [
+    # One ride's requests in arrival order (GET /rides/{ride_id}/requests)
+    {
+        'IndexName': 'ride_id-created_at-index',
+        'KeySchema': [
+            {'AttributeName': 'ride_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    },
+    # Driver inbox: begins_with(status_created, "pending#") lists pending requests oldest first
+    {
+        'IndexName': 'driver_id-status_created-index',
+        'KeySchema': [
+            {'AttributeName': 'driver_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'status_created', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    },
+    # Rider's own requests across rides (GET /users/{user_id}/requests)
+    {
+        'IndexName': 'rider_id-created_at-index',
+        'KeySchema': [
+            {'AttributeName': 'rider_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    },
+]
+
+def create_table():
+    """Creates the RUBookRide table with all necessary attributes and indexes."""
+    try:
+        table = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'request_id', 'KeyType': 'HASH'}  # Partition Key
+            ],
+            AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+            GlobalSecondaryIndexes=GLOBAL_SECONDARY_INDEXES,
+            BillingMode='PAY_PER_REQUEST'  # On-demand pricing
+        )
+
+        print(f"Creating table {TABLE_NAME}...")
+        table.wait_until_exists()
+        print(f"Table {TABLE_NAME} created successfully!")
+
+    except Exception as e:
+        print(f"Error creating table: {str(e)}")
+
+def add_index(index_name):
+    """Adds one of the indexes above to an existing RUBookRide table (DynamoDB creates one GSI per update)."""
+    try:
+        index = next(i for i in GLOBAL_SECONDARY_INDEXES if i['IndexName'] == index_name)
+        dynamodb.meta.client.update_table(
+            TableName=TABLE_NAME,
+            AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+            GlobalSecondaryIndexUpdates=[{'Create': index}]
+        )
+        print(f"Creating index {index_name} on {TABLE_NAME}...")
+
+    except Exception as e:
+        print(f"Error updating table: {str(e)}")
+
+def backfill_status_created():
+    """Sets status_created on requests written before the driver inbox index existed."""
+    table = dynamodb.Table(TABLE_NAME)
+    scan_kwargs = {'FilterExpression': 'attribute_not_exists(status_created)'}
+    updated = 0
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            table.update_item(
+                Key={'request_id': item['request_id']},
+                UpdateExpression='SET status_created = :status_created',
+                ExpressionAttributeValues={':status_created': f"{item['ride_status']}#{item['created_at']}"}
+            )
+            updated += 1
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    print(f"Backfilled status_created on {updated} requests")
+
+if __name__ == "__main__":
+    create_table()
+    
+# python3 RUBookRide.py
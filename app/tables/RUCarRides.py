@@ -0,0 +1,61 @@
+import boto3
+
+# Initialize DynamoDB resource
+dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+TABLE_NAME = "RUCarRides"
+
+# Driver's rides ordered by departure time (GET /users/{user_id}/rides)
+USER_RIDES_INDEX = {
+    'IndexName': 'user_id-departure_time-index',
+    'KeySchema': [
+        {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+        {'AttributeName': 'departure_time', 'KeyType': 'RANGE'}
+    ],
+    'Projection': {'ProjectionType': 'ALL'}
+}
+
+def create_table():
+    """Creates the RUCarRides table with all necessary attributes and indexes."""
+    try:
+        table = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'ride_id', 'KeyType': 'HASH'}  # Partition Key
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'ride_id', 'AttributeType': 'S'},  # String (UUID)
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},  # String (driver)
+                {'AttributeName': 'departure_time', 'AttributeType': 'S'},  # String (ISO Timestamp)
+            ],
+            GlobalSecondaryIndexes=[USER_RIDES_INDEX],
+            BillingMode='PAY_PER_REQUEST'  # On-demand pricing
+        )
+
+        print(f"Creating table {TABLE_NAME}...")
+        table.wait_until_exists()
+        print(f"Table {TABLE_NAME} created successfully!")
+
+    except Exception as e:
+        print(f"Error creating table: {str(e)}")
+
+def add_indexes():
+    """Adds the user_id/departure_time index to an existing RUCarRides table."""
+    try:
+        dynamodb.meta.client.update_table(
+            TableName=TABLE_NAME,
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'departure_time', 'AttributeType': 'S'},
+            ],
+            GlobalSecondaryIndexUpdates=[{'Create': USER_RIDES_INDEX}]
+        )
+        print(f"Creating index {USER_RIDES_INDEX['IndexName']} on {TABLE_NAME}...")
+
+    except Exception as e:
+        print(f"Error updating table: {str(e)}")
+
+if __name__ == "__main__":
+    create_table()
+    
+# python3 RUCarRides.py
@@ -0,0 +1,43 @@
+import boto3
+
+# Initialize DynamoDB resource
+dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+TABLE_NAME = "RUEventOutbox"
+
+def create_table():
+    """
+    Creates the RUEventOutbox table. Booking transactions write their EventBridge
+    entries here; the stream feeds event_publisher.drain_outbox, which publishes them.
+    """
+    try:
+        table = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'event_id', 'KeyType': 'HASH'}  # Partition Key
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'event_id', 'AttributeType': 'S'},  # String (UUID)
+            ],
+            StreamSpecification={'StreamEnabled': True, 'StreamViewType': 'NEW_IMAGE'},
+            BillingMode='PAY_PER_REQUEST'  # On-demand pricing
+        )
+
+        print(f"Creating table {TABLE_NAME}...")
+        table.wait_until_exists()
+
+        # Published entries are only kept around briefly
+        dynamodb.meta.client.update_time_to_live(
+            TableName=TABLE_NAME,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+        )
+        print(f"Table {TABLE_NAME} created successfully!")
+        print(f"Stream ARN (map to RUDrainEventOutbox with ReportBatchItemFailures): {table.latest_stream_arn}")
+
+    except Exception as e:
+        print(f"Error creating table: {str(e)}")
+
+if __name__ == "__main__":
+    create_table()
+    
+# python3 RUEventOutbox.py
@@ -0,0 +1,38 @@
+import boto3
+
+# Initialize DynamoDB resource
+dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+TABLE_NAME = "RUIdempotency"
+
+def create_table():
+    """Creates the RUIdempotency table used to deduplicate retried POST /rides/create calls."""
+    try:
+        table = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'idempotency_key', 'KeyType': 'HASH'}  # "create_ride#<user_id>#<Idempotency-Key header>"
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'idempotency_key', 'AttributeType': 'S'},  # String
+            ],
+            BillingMode='PAY_PER_REQUEST'  # On-demand pricing
+        )
+
+        print(f"Creating table {TABLE_NAME}...")
+        table.wait_until_exists()
+
+        # Expire stored responses automatically
+        dynamodb.meta.client.update_time_to_live(
+            TableName=TABLE_NAME,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+        )
+        print(f"Table {TABLE_NAME} created successfully!")
+
+    except Exception as e:
+        print(f"Error creating table: {str(e)}")
+
+if __name__ == "__main__":
+    create_table()
+    
+# python3 RUIdempotency.py
@@ -0,0 +1,60 @@
+import boto3
+
+# Initialize DynamoDB resource
+dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+TABLE_NAME = "RUNotificationCounters"
+
+def create_table():
+    """
+    Creates the RUNotificationCounters table: one item per user holding unread_count and
+    total_count, incremented by the notification dispatcher. unread_count is decremented when
+    notifications are read; both are corrected when the inbox cap evicts notifications.
+    """
+    try:
+        table = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'}  # Partition Key
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},  # String (UUID)
+            ],
+            BillingMode='PAY_PER_REQUEST'  # On-demand pricing
+        )
+
+        print(f"Creating table {TABLE_NAME}...")
+        table.wait_until_exists()
+        print(f"Table {TABLE_NAME} created successfully!")
+
+    except Exception as e:
+        print(f"Error creating table: {str(e)}")
+
+def backfill_unread_counts():
+    """Sets every user's unread_count and total_count from the notifications already in RUNotifications."""
+    notifications = dynamodb.Table("RUNotifications")
+    counters = dynamodb.Table(TABLE_NAME)
+    counts = {}  # user_id -> [unread, total]
+    scan_kwargs = {'ProjectionExpression': 'user_id, notification_status'}
+    while True:
+        response = notifications.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            count = counts.setdefault(item['user_id'], [0, 0])
+            count[0] += item.get('notification_status') == 'unread'
+            count[1] += 1
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    for user_id, (unread, total) in counts.items():
+        counters.update_item(
+            Key={'user_id': user_id},
+            UpdateExpression='SET unread_count = :unread, total_count = :total',
+            ExpressionAttributeValues={':unread': unread, ':total': total}
+        )
+    print(f"Backfilled unread_count and total_count for {len(counts)} users")
+
+if __name__ == "__main__":
+    create_table()
+
+# python3 RUNotificationCounters.py
@@ -0,0 +1,60 @@
+import boto3
+
+# Initialize DynamoDB resource
+dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+TABLE_NAME = "RUNotificationDigests"
+
+ATTRIBUTE_DEFINITIONS = [
+    {'AttributeName': 'user_id', 'AttributeType': 'S'},  # String (UUID)
+    {'AttributeName': 'sk', 'AttributeType': 'S'},  # "window" or "entry#<notification_id>"
+    {'AttributeName': 'digest_status', 'AttributeType': 'S'},  # "open", only on window items
+    {'AttributeName': 'window_ends_at', 'AttributeType': 'S'},  # String (ISO Timestamp)
+]
+
+GLOBAL_SECONDARY_INDEXES = [
+    # Sparse: only window items carry digest_status, so this lists users with a digest due
+    {
+        'IndexName': 'digest_status-window_ends_at-index',
+        'KeySchema': [
+            {'AttributeName': 'digest_status', 'KeyType': 'HASH'},
+            {'AttributeName': 'window_ends_at', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    },
+]
+
+def create_table():
+    """
+    Creates the RUNotificationDigests table: notifications for offline users queued under
+    the user, plus one window item per user that send_notification_digests picks up when due.
+    """
+    try:
+        table = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},  # Partition Key
+                {'AttributeName': 'sk', 'KeyType': 'RANGE'}  # Sort Key
+            ],
+            AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+            GlobalSecondaryIndexes=GLOBAL_SECONDARY_INDEXES,
+            BillingMode='PAY_PER_REQUEST'  # On-demand pricing
+        )
+
+        print(f"Creating table {TABLE_NAME}...")
+        table.wait_until_exists()
+
+        # Safety net for entries of users who never get an email address
+        dynamodb.meta.client.update_time_to_live(
+            TableName=TABLE_NAME,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+        )
+        print(f"Table {TABLE_NAME} created successfully!")
+
+    except Exception as e:
+        print(f"Error creating table: {str(e)}")
+
+if __name__ == "__main__":
+    create_table()
+
+# python3 RUNotificationDigests.py
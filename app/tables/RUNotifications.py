@@ -0,0 +1,110 @@
+import boto3
+
+# Initialize DynamoDB resource
+dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+TABLE_NAME = "RUNotifications"
+
+ATTRIBUTE_DEFINITIONS = [
+    {'AttributeName': 'notification_id', 'AttributeType': 'S'},  # String (UUID)
+    {'AttributeName': 'user_id', 'AttributeType': 'S'},  # String (recipient)
+    {'AttributeName': 'timestamp', 'AttributeType': 'S'},  # String (ISO Timestamp)
+    {'AttributeName': 'unread_at', 'AttributeType': 'S'},  # Copy of timestamp, present only while unread
+]
+
+GLOBAL_SECONDARY_INDEXES = [
+    # A user's inbox, newest first with ScanIndexForward=False (GET /notifications/{user_id})
+    {
+        'IndexName': 'user_id-timestamp-index',
+        'KeySchema': [
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    },
+    # Sparse: marking a notification read removes unread_at, which drops it from this index
+    {
+        'IndexName': 'user_id-unread_at-index',
+        'KeySchema': [
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'unread_at', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    },
+]
+
+def create_table():
+    """Creates the RUNotifications table with all necessary attributes and indexes."""
+    try:
+        table = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'notification_id', 'KeyType': 'HASH'}  # Partition Key
+            ],
+            AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+            GlobalSecondaryIndexes=GLOBAL_SECONDARY_INDEXES,
+            # TTL deletions reach notification_retention.archive_expired through the stream
+            StreamSpecification={'StreamEnabled': True, 'StreamViewType': 'OLD_IMAGE'},
+            BillingMode='PAY_PER_REQUEST'  # On-demand pricing
+        )
+
+        print(f"Creating table {TABLE_NAME}...")
+        table.wait_until_exists()
+        enable_ttl()
+        print(f"Table {TABLE_NAME} created successfully!")
+
+    except Exception as e:
+        print(f"Error creating table: {str(e)}")
+
+def enable_ttl():
+    """Turns on TTL for expires_at, which is set when a notification is marked read."""
+    try:
+        dynamodb.meta.client.update_time_to_live(
+            TableName=TABLE_NAME,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+        )
+        print(f"Enabled TTL on {TABLE_NAME}.expires_at")
+
+    except Exception as e:
+        print(f"Error enabling TTL: {str(e)}")
+
+def add_index(index_name):
+    """Adds one of the indexes above to an existing RUNotifications table (DynamoDB creates one GSI per update)."""
+    try:
+        index = next(i for i in GLOBAL_SECONDARY_INDEXES if i['IndexName'] == index_name)
+        dynamodb.meta.client.update_table(
+            TableName=TABLE_NAME,
+            AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+            GlobalSecondaryIndexUpdates=[{'Create': index}]
+        )
+        print(f"Creating index {index_name} on {TABLE_NAME}...")
+
+    except Exception as e:
+        print(f"Error updating table: {str(e)}")
+
+def backfill_unread_at():
+    """Sets unread_at on unread notifications written before the unread index existed."""
+    table = dynamodb.Table(TABLE_NAME)
+    scan_kwargs = {
+        'FilterExpression': 'notification_status = :unread AND attribute_not_exists(unread_at)',
+        'ExpressionAttributeValues': {':unread': 'unread'}
+    }
+    updated = 0
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            table.update_item(
+                Key={'notification_id': item['notification_id']},
+                UpdateExpression='SET unread_at = #ts',
+                ExpressionAttributeNames={'#ts': 'timestamp'}
+            )
+            updated += 1
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    print(f"Backfilled unread_at on {updated} notifications")
+
+if __name__ == "__main__":
+    create_table()
+
+# python3 RUNotifications.py
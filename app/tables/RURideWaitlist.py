@@ -0,0 +1,37 @@
+import boto3
+
+# Initialize DynamoDB resource
+dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+TABLE_NAME = "RURideWaitlist"
+
+def create_table():
+    """
+    Creates the RURideWaitlist table: one item per waitlisted request, sorted under
+    its ride by position "<queued_at>#<request_id>", so the head is a one-item query.
+    """
+    try:
+        table = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'ride_id', 'KeyType': 'HASH'},  # Partition Key
+                {'AttributeName': 'position', 'KeyType': 'RANGE'}  # Sort Key (FIFO order)
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'ride_id', 'AttributeType': 'S'},
+                {'AttributeName': 'position', 'AttributeType': 'S'},
+            ],
+            BillingMode='PAY_PER_REQUEST'  # On-demand pricing
+        )
+
+        print(f"Creating table {TABLE_NAME}...")
+        table.wait_until_exists()
+        print(f"Table {TABLE_NAME} created successfully!")
+
+    except Exception as e:
+        print(f"Error creating table: {str(e)}")
+
+if __name__ == "__main__":
+    create_table()
+    
+# python3 RURideWaitlist.py
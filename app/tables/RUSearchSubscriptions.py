@@ -0,0 +1,42 @@
+import boto3
+
+# Initialize DynamoDB resource
+dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+TABLE_NAME = "RUSearchSubscriptions"
+
+def create_table():
+    """
+    Creates the RUSearchSubscriptions table: one item per (geohash cell, 2-hour departure
+    bucket, WebSocket connection) of a subscribed search, expired by TTL unless searched again.
+    """
+    try:
+        table = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'cell_key', 'KeyType': 'HASH'},  # Partition Key: "<geohash5>#<bucket>"
+                {'AttributeName': 'connection_id', 'KeyType': 'RANGE'}  # Sort Key
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'cell_key', 'AttributeType': 'S'},
+                {'AttributeName': 'connection_id', 'AttributeType': 'S'},
+            ],
+            BillingMode='PAY_PER_REQUEST'  # On-demand pricing
+        )
+
+        print(f"Creating table {TABLE_NAME}...")
+        table.wait_until_exists()
+
+        dynamodb.meta.client.update_time_to_live(
+            TableName=TABLE_NAME,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+        )
+        print(f"Table {TABLE_NAME} created successfully!")
+
+    except Exception as e:
+        print(f"Error creating table: {str(e)}")
+
+if __name__ == "__main__":
+    create_table()
+
+# python3 RUSearchSubscriptions.py
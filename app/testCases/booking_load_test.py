@@ -0,0 +1,267 @@
+"""
+Concurrency stress harness for book_ride.
+
+Runs many simulated riders and drivers in parallel against a local
+DynamoDB-compatible endpoint (DynamoDB Local), driving create_ride_request
+and update_ride_request through book_ride.lambda_handler. It reports
+throughput, latency percentiles, conditional-check failure rates and any
+seat invariant violations (negative seats, overbooking, a waitlist out of
+sync with request statuses). Cancels of accepted requests exercise waitlist promotion.
+
+Events are not published: book_ride writes them to the RUEventOutbox table,
+which the harness creates without a stream and counts at the end.
+
+Start DynamoDB Local (kept off port 8000, which uvicorn uses):
+    docker run -p 8001:8000 amazon/dynamodb-local
+
+Then run from the repository root:
+    python -m app.testCases.booking_load_test --rides 5 --riders 200 --workers 32
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+
+# Tables book_ride touches, created fresh for every run
+TABLE_DEFINITIONS = {
+    "RUCarRides": {
+        "KeySchema": [{"AttributeName": "ride_id", "KeyType": "HASH"}],
+        "AttributeDefinitions": [{"AttributeName": "ride_id", "AttributeType": "S"}],
+    },
+    "RUBookRide": {
+        "KeySchema": [{"AttributeName": "request_id", "KeyType": "HASH"}],
+        "AttributeDefinitions": [{"AttributeName": "request_id", "AttributeType": "S"}],
+    },
+    "RUEventOutbox": {
+        "KeySchema": [{"AttributeName": "event_id", "KeyType": "HASH"}],
+        "AttributeDefinitions": [{"AttributeName": "event_id", "AttributeType": "S"}],
+    },
+    "RURideWaitlist": {
+        "KeySchema": [{"AttributeName": "ride_id", "KeyType": "HASH"},
+                      {"AttributeName": "position", "KeyType": "RANGE"}],
+        "AttributeDefinitions": [{"AttributeName": "ride_id", "AttributeType": "S"},
+                                 {"AttributeName": "position", "AttributeType": "S"}],
+    },
+}
+
+
+class Metrics:
+    """Thread-safe latency and status-code collection per operation."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(Counter)
+
+    def record(self, operation, seconds, response):
+        body = json.loads(response.get("body") or "{}")
+        outcome = f"{response['statusCode']} {body.get('error') or body.get('message', '')}".strip()
+        with self.lock:
+            self.latencies[operation].append(seconds)
+            self.outcomes[operation][outcome] += 1
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def configure_environment(endpoint):
+    """Point every boto3 DynamoDB client at the local endpoint before book_ride is imported."""
+    os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = endpoint
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+
+
+def reset_tables(dynamodb):
+    client = dynamodb.meta.client
+    existing = client.list_tables()["TableNames"]
+    for name, definition in TABLE_DEFINITIONS.items():
+        if name in existing:
+            client.delete_table(TableName=name)
+            client.get_waiter("table_not_exists").wait(TableName=name)
+        client.create_table(TableName=name, BillingMode="PAY_PER_REQUEST", **definition)
+        client.get_waiter("table_exists").wait(TableName=name)
+
+
+def seed_rides(dynamodb, count, seats):
+    rides = []
+    table = dynamodb.Table("RUCarRides")
+    for i in range(count):
+        ride = {
+            "ride_id": str(uuid.uuid4()),
+            "user_id": f"driver-{i}",
+            "total_seats": seats,
+            "available_seats": seats,
+            "departure_time": "2030-01-01T10:00:00",
+            "ride_status": "scheduled",
+            "version": 1,
+        }
+        table.put_item(Item=ride)
+        rides.append(ride)
+    return rides
+
+
+def timed_call(book_ride, metrics, operation, event):
+    start = time.perf_counter()
+    response = book_ride.lambda_handler(event, None)
+    metrics.record(operation, time.perf_counter() - start, response)
+    return response
+
+
+def request_ride(book_ride, metrics, ride, rider_id, seats):
+    event = {
+        "httpMethod": "POST",
+        "pathParameters": {"ride_id": ride["ride_id"]},
+        "body": json.dumps({"rider_id": rider_id, "seats_requested": seats}),
+    }
+    response = timed_call(book_ride, metrics, "create_ride_request", event)
+    if response["statusCode"] in (200, 201):
+        return json.loads(response["body"])["request_id"]
+    return None
+
+
+def act_on_request(book_ride, metrics, ride, request_id, action, user_id):
+    event = {
+        "httpMethod": "PUT",
+        "pathParameters": {"ride_id": ride["ride_id"], "request_id": request_id},
+        "body": json.dumps({"action": action, "user_id": user_id}),
+    }
+    return timed_call(book_ride, metrics, f"update_ride_request:{action}", event)
+
+
+def scan_all(table):
+    response = table.scan(ConsistentRead=True)
+    items = response["Items"]
+    while "LastEvaluatedKey" in response:
+        response = table.scan(ConsistentRead=True, ExclusiveStartKey=response["LastEvaluatedKey"])
+        items.extend(response["Items"])
+    return items
+
+
+def check_invariants(dynamodb, rides):
+    """
+    Every ride must satisfy 0 <= available_seats and available + accepted seats == total seats,
+    and the waitlist must hold exactly the waitlisted requests.
+    """
+    items = scan_all(dynamodb.Table("RUBookRide"))
+
+    accepted = Counter()
+    for item in items:
+        if item["ride_status"] == "accepted":
+            accepted[item["ride_id"]] += int(item["seats_requested"])
+
+    violations = []
+    waitlisted = {item["request_id"] for item in items if item["ride_status"] == "waitlisted"}
+    queued = {entry["request_id"] for entry in scan_all(dynamodb.Table("RURideWaitlist"))}
+    for request_id in waitlisted ^ queued:
+        violations.append(f"request {request_id}: waitlist out of sync with its status")
+    for ride in rides:
+        stored = dynamodb.Table("RUCarRides").get_item(Key={"ride_id": ride["ride_id"]}, ConsistentRead=True)["Item"]
+        available = int(stored["available_seats"])
+        total = int(stored["total_seats"])
+        if available < 0:
+            violations.append(f"ride {ride['ride_id']}: negative available_seats ({available})")
+        if accepted[ride["ride_id"]] > total:
+            violations.append(f"ride {ride['ride_id']}: overbooked ({accepted[ride['ride_id']]} accepted of {total})")
+        if available + accepted[ride["ride_id"]] != total:
+            violations.append(
+                f"ride {ride['ride_id']}: seats drifted (available {available} + accepted {accepted[ride['ride_id']]} != total {total})"
+            )
+    return violations
+
+
+def print_report(metrics, wall_seconds, event_count, violations):
+    total_ops = sum(len(v) for v in metrics.latencies.values())
+    print(f"\n=== Booking load test: {total_ops} operations in {wall_seconds:.2f}s "
+          f"({total_ops / wall_seconds:.1f} ops/s) ===")
+
+    for operation, latencies in sorted(metrics.latencies.items()):
+        ms = [l * 1000 for l in latencies]
+        print(f"\n{operation}: {len(ms)} calls")
+        print(f"  latency ms  p50={percentile(ms, 50):.1f}  p95={percentile(ms, 95):.1f}  "
+              f"p99={percentile(ms, 99):.1f}  max={max(ms):.1f}")
+        rejected = sum(n for outcome, n in metrics.outcomes[operation].items() if outcome.startswith(("400", "409")))
+        print(f"  conditional-check failures: {rejected} ({rejected / len(ms):.1%})")
+        for outcome, n in metrics.outcomes[operation].most_common():
+            print(f"    {n:6d}  {outcome}")
+
+    print(f"\nOutbox events written: {event_count}")
+    if violations:
+        print(f"\n❌ {len(violations)} invariant violation(s):")
+        for violation in violations:
+            print(f"  - {violation}")
+    else:
+        print("\n✅ No invariant violations (no negative seats, no overbooking)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", default=os.getenv("DYNAMODB_ENDPOINT", "http://localhost:8001"))
+    parser.add_argument("--rides", type=int, default=5, help="rides to seed")
+    parser.add_argument("--seats", type=int, default=4, help="seats per ride")
+    parser.add_argument("--riders", type=int, default=200, help="simulated riders, one request each")
+    parser.add_argument("--workers", type=int, default=32, help="concurrent threads")
+    parser.add_argument("--cancel-rate", type=float, default=0.2, help="share of requests the rider cancels")
+    parser.add_argument("--duplicate-rate", type=float, default=0.2, help="share of accepts the driver double-taps")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="keep book_ride's own logging")
+    args = parser.parse_args()
+
+    configure_environment(args.endpoint)
+    sys.path.insert(0, LAMBDAS_DIR)
+    import boto3
+    import book_ride
+
+    rng = random.Random(args.seed)
+    dynamodb = boto3.resource("dynamodb")
+
+    reset_tables(dynamodb)
+    rides = seed_rides(dynamodb, args.rides, args.seats)
+    metrics = Metrics()
+
+    stdout = sys.stdout
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            # Phase 1: riders pile requests onto a handful of rides
+            assignments = [(rng.choice(rides), f"rider-{i}", rng.choice([1, 1, 2])) for i in range(args.riders)]
+            request_ids = list(executor.map(lambda a: request_ride(book_ride, metrics, *a), assignments))
+
+            # Phase 2: drivers accept concurrently while riders cancel and drivers double-tap
+            tasks = []
+            for (ride, rider_id, _), request_id in zip(assignments, request_ids):
+                if not request_id:
+                    continue
+                tasks.append((ride, request_id, "accept", ride["user_id"]))
+                if rng.random() < args.duplicate_rate:
+                    tasks.append((ride, request_id, "accept", ride["user_id"]))
+                if rng.random() < args.cancel_rate:
+                    tasks.append((ride, request_id, "cancel", rider_id))
+            rng.shuffle(tasks)
+            list(executor.map(lambda t: act_on_request(book_ride, metrics, *t), tasks))
+    finally:
+        wall_seconds = time.perf_counter() - start
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    violations = check_invariants(dynamodb, rides)
+    print_report(metrics, wall_seconds, len(scan_all(dynamodb.Table("RUEventOutbox"))), violations)
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Shared fixtures for the Lambda tests, run against moto's in-memory DynamoDB.
+
+The Lambdas import their siblings by bare module name, so app/lambdas goes on
+sys.path, and fake credentials keep boto3 away from real AWS. Run from the
+repository root:
+    pip install pytest moto
+    python -m pytest app/testCases
+"""
+import os
+import sys
+
+import boto3
+import pytest
+from moto import mock_aws  # Imported before any Lambda so their boto3 clients are intercepted
+
+from app.testCases.booking_load_test import LAMBDAS_DIR, TABLE_DEFINITIONS
+
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+os.environ.pop("AWS_ENDPOINT_URL_DYNAMODB", None)
+if LAMBDAS_DIR not in sys.path:
+    sys.path.insert(0, LAMBDAS_DIR)
+
+# Tables the ride creation and notification Lambdas touch, on top of book_ride's
+TEST_TABLE_DEFINITIONS = {
+    **TABLE_DEFINITIONS,
+    "RUIdempotency": {
+        "KeySchema": [{"AttributeName": "idempotency_key", "KeyType": "HASH"}],
+        "AttributeDefinitions": [{"AttributeName": "idempotency_key", "AttributeType": "S"}],
+    },
+    "RUNotifications": {
+        "KeySchema": [{"AttributeName": "notification_id", "KeyType": "HASH"}],
+        "AttributeDefinitions": [{"AttributeName": "notification_id", "AttributeType": "S"}],
+    },
+    "RUNotificationCounters": {
+        "KeySchema": [{"AttributeName": "user_id", "KeyType": "HASH"}],
+        "AttributeDefinitions": [{"AttributeName": "user_id", "AttributeType": "S"}],
+    },
+}
+
+
+@pytest.fixture
+def dynamodb():
+    """A fresh moto account with every table created."""
+    with mock_aws():
+        resource = boto3.resource("dynamodb")
+        for name, definition in TEST_TABLE_DEFINITIONS.items():
+            resource.meta.client.create_table(TableName=name, BillingMode="PAY_PER_REQUEST", **definition)
+        yield resource
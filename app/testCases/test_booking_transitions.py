@@ -0,0 +1,98 @@
+"""Ride request transitions through book_ride.lambda_handler (see conftest.py for setup)."""
+import json
+
+import book_ride
+from app.testCases.booking_load_test import check_invariants, scan_all, seed_rides
+
+
+def request_ride(ride, rider_id, seats=1):
+    return book_ride.lambda_handler({
+        "httpMethod": "POST",
+        "pathParameters": {"ride_id": ride["ride_id"]},
+        "body": json.dumps({"rider_id": rider_id, "seats_requested": seats}),
+    }, None)
+
+
+def act_on_request(ride, request_id, action, user_id):
+    return book_ride.lambda_handler({
+        "httpMethod": "PUT",
+        "pathParameters": {"ride_id": ride["ride_id"], "request_id": request_id},
+        "body": json.dumps({"action": action, "user_id": user_id}),
+    }, None)
+
+
+def request_status(dynamodb, request_id):
+    return dynamodb.Table("RUBookRide").get_item(Key={"request_id": request_id})["Item"]["ride_status"]
+
+
+def available_seats(dynamodb, ride):
+    return int(dynamodb.Table("RUCarRides").get_item(Key={"ride_id": ride["ride_id"]})["Item"]["available_seats"])
+
+
+def test_request_is_created_with_its_event(dynamodb):
+    ride = seed_rides(dynamodb, 1, seats=2)[0]
+
+    response = request_ride(ride, "rider-1")
+
+    assert response["statusCode"] == 201, response["body"]
+    request_id = json.loads(response["body"])["request_id"]
+    assert request_status(dynamodb, request_id) == "pending"
+    assert len(scan_all(dynamodb.Table("RUEventOutbox"))) == 1
+
+
+def test_duplicate_request_returns_the_existing_one(dynamodb):
+    ride = seed_rides(dynamodb, 1, seats=2)[0]
+    first = json.loads(request_ride(ride, "rider-1")["body"])
+
+    response = request_ride(ride, "rider-1")
+
+    assert response["statusCode"] == 200, response["body"]
+    body = json.loads(response["body"])
+    assert body["request_id"] == first["request_id"]
+    assert body["ride_status"] == "pending"
+    assert len(scan_all(dynamodb.Table("RUBookRide"))) == 1
+
+
+def test_accept_takes_seats_and_a_full_ride_waitlists(dynamodb):
+    ride = seed_rides(dynamodb, 1, seats=1)[0]
+    first = json.loads(request_ride(ride, "rider-1")["body"])["request_id"]
+    second = json.loads(request_ride(ride, "rider-2")["body"])["request_id"]
+
+    accepted = act_on_request(ride, first, "accept", ride["user_id"])
+    waitlisted = act_on_request(ride, second, "accept", ride["user_id"])
+
+    assert accepted["statusCode"] == 200, accepted["body"]
+    assert waitlisted["statusCode"] == 202, waitlisted["body"]
+    assert request_status(dynamodb, first) == "accepted"
+    assert request_status(dynamodb, second) == "waitlisted"
+    assert available_seats(dynamodb, ride) == 0
+    assert check_invariants(dynamodb, [ride]) == []
+
+
+def test_cancel_promotes_the_waitlist(dynamodb):
+    ride = seed_rides(dynamodb, 1, seats=1)[0]
+    first = json.loads(request_ride(ride, "rider-1")["body"])["request_id"]
+    second = json.loads(request_ride(ride, "rider-2")["body"])["request_id"]
+    act_on_request(ride, first, "accept", ride["user_id"])
+    act_on_request(ride, second, "accept", ride["user_id"])
+
+    response = act_on_request(ride, first, "cancel", "rider-1")
+
+    assert response["statusCode"] == 200, response["body"]
+    assert request_status(dynamodb, first) == "canceled"
+    assert request_status(dynamodb, second) == "accepted"
+    assert available_seats(dynamodb, ride) == 0
+    assert scan_all(dynamodb.Table("RURideWaitlist")) == []
+    assert check_invariants(dynamodb, [ride]) == []
+
+
+def test_repeated_transition_is_rejected(dynamodb):
+    ride = seed_rides(dynamodb, 1, seats=2)[0]
+    request_id = json.loads(request_ride(ride, "rider-1")["body"])["request_id"]
+    act_on_request(ride, request_id, "accept", ride["user_id"])
+
+    response = act_on_request(ride, request_id, "accept", ride["user_id"])
+
+    assert response["statusCode"] == 409, response["body"]
+    assert available_seats(dynamodb, ride) == 1
+    assert check_invariants(dynamodb, [ride]) == []
@@ -0,0 +1,72 @@
+"""Idempotent ride creation through car_rides.create_ride (see conftest.py for setup)."""
+import io
+import json
+
+import pytest
+
+import car_rides
+from app.testCases.booking_load_test import scan_all
+
+RIDE = {
+    "user_id": "driver-1",
+    "from_lat": 40.50, "from_long": -74.45,
+    "to_lat": 40.74, "to_long": -74.17,
+    "departure_time": "2030-01-01T10:00:00",
+    "total_seats": 3, "available_seats": 3,
+}
+
+
+class FakeLambdaClient:
+    """Stands in for the emissions Lambda, which moto cannot run."""
+
+    def __init__(self):
+        self.invocations = []
+
+    def invoke(self, **kwargs):
+        self.invocations.append(kwargs)
+        return {"Payload": io.BytesIO(json.dumps({"statusCode": 200}).encode("utf-8"))}
+
+
+@pytest.fixture
+def lambda_client(dynamodb, monkeypatch):
+    client = FakeLambdaClient()
+    monkeypatch.setattr(car_rides, "lambda_client", client)
+    # No OSRM here: every ride gets the same short route
+    monkeypatch.setattr(car_rides, "compute_route", lambda *coords: {
+        "route_geohashes": ["dr5ru", "dr5rv"], "distance_km": 1.5, "duration": 120.0
+    })
+    return client
+
+
+def create_ride(ride, idempotency_key):
+    return car_rides.create_ride({"headers": {"Idempotency-Key": idempotency_key}, "body": json.dumps(ride)}, None)
+
+
+def test_retry_replays_the_same_ride(dynamodb, lambda_client):
+    first = create_ride(RIDE, "key-1")
+    retry = create_ride(RIDE, "key-1")
+
+    assert first["statusCode"] == 200, first["body"]
+    assert retry["statusCode"] == 200, retry["body"]
+    assert retry["headers"]["Idempotent-Replayed"] == "true"
+    assert json.loads(retry["body"])["ride_id"] == json.loads(first["body"])["ride_id"]
+    assert len(scan_all(dynamodb.Table("RUCarRides"))) == 1
+    assert len(scan_all(dynamodb.Table("RUEventOutbox"))) == 1
+    assert len(lambda_client.invocations) == 1
+
+
+def test_key_reused_with_another_body_is_rejected(dynamodb, lambda_client):
+    create_ride(RIDE, "key-1")
+
+    response = create_ride({**RIDE, "total_seats": 4}, "key-1")
+
+    assert response["statusCode"] == 422, response["body"]
+    assert len(scan_all(dynamodb.Table("RUCarRides"))) == 1
+
+
+def test_different_keys_create_different_rides(dynamodb, lambda_client):
+    first = create_ride(RIDE, "key-1")
+    second = create_ride(RIDE, "key-2")
+
+    assert json.loads(first["body"])["ride_id"] != json.loads(second["body"])["ride_id"]
+    assert len(scan_all(dynamodb.Table("RUCarRides"))) == 2
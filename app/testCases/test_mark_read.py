@@ -0,0 +1,70 @@
+"""Mark-read transactions in update_noti.lambda_handler (see conftest.py for setup)."""
+import json
+
+import update_noti
+
+
+def seed_notification(dynamodb, notification_id, user_id, unread_count=1):
+    dynamodb.Table("RUNotifications").put_item(Item={
+        "notification_id": notification_id,
+        "user_id": user_id,
+        "notification_status": "unread",
+        "unread_at": "2030-01-01T10:00:00",
+        "message": "Your ride request was accepted",
+    })
+    dynamodb.Table("RUNotificationCounters").put_item(Item={"user_id": user_id, "unread_count": unread_count})
+
+
+def mark_read(notification_id, user_id):
+    return update_noti.lambda_handler({"body": json.dumps({"notification_id": notification_id, "user_id": user_id})}, None)
+
+
+def unread_count(dynamodb, user_id):
+    return int(dynamodb.Table("RUNotificationCounters").get_item(Key={"user_id": user_id})["Item"]["unread_count"])
+
+
+def test_mark_read_updates_notification_and_counter(dynamodb):
+    seed_notification(dynamodb, "n-1", "user-1", unread_count=2)
+
+    response = mark_read("n-1", "user-1")
+
+    assert response["statusCode"] == 200, response["body"]
+    assert json.loads(response["body"])["message"] == "Notification marked as read"
+    item = dynamodb.Table("RUNotifications").get_item(Key={"notification_id": "n-1"})["Item"]
+    assert item["notification_status"] == "read"
+    assert "unread_at" not in item
+    assert "expires_at" in item
+    assert unread_count(dynamodb, "user-1") == 1
+
+
+def test_second_mark_read_changes_nothing(dynamodb):
+    seed_notification(dynamodb, "n-1", "user-1")
+    mark_read("n-1", "user-1")
+
+    response = mark_read("n-1", "user-1")
+
+    assert response["statusCode"] == 200, response["body"]
+    assert json.loads(response["body"])["message"] == "Notification already read"
+    assert unread_count(dynamodb, "user-1") == 0
+
+
+def test_other_users_notification_is_not_marked(dynamodb):
+    seed_notification(dynamodb, "n-1", "user-1")
+
+    response = mark_read("n-1", "user-2")
+
+    assert json.loads(response["body"])["message"] == "Notification already read"
+    item = dynamodb.Table("RUNotifications").get_item(Key={"notification_id": "n-1"})["Item"]
+    assert item["notification_status"] == "unread"
+    assert unread_count(dynamodb, "user-1") == 1
+
+
+def test_drifted_counter_still_marks_read(dynamodb):
+    seed_notification(dynamodb, "n-1", "user-1", unread_count=0)
+
+    response = mark_read("n-1", "user-1")
+
+    assert response["statusCode"] == 200, response["body"]
+    item = dynamodb.Table("RUNotifications").get_item(Key={"notification_id": "n-1"})["Item"]
+    assert item["notification_status"] == "read"
+    assert unread_count(dynamodb, "user-1") == 0